@@ -0,0 +1,148 @@
+"""
+Benchmark do OCR do letreiro: EasyOCR x leitor de dígitos x dígitos + fallback
+Mede latência por letreiro e acerto da linha
+
+Uso:
+    python benchmark_ocr.py [diretório]
+
+O diretório deve ter recortes de letreiros nomeados pela linha
+(ex: "437_camera_A_001.jpg"). Números fora de LINHAS (ex: "2541_...")
+entram como letreiros de outras linhas: o certo é não ler nada. Sem
+diretório, usa letreiros sintéticos com fontes e estilos diferentes dos
+templates, das linhas conhecidas e de números parecidos com elas.
+"""
+import glob
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from src.brt.digitos import ReconhecedorLinha
+from src.brt.letreiro import preprocessar_letreiro, leituras_validas
+
+LINHAS = ["437", "2441", "2450", "2444"]
+# Linhas fora do vocabulário, a um dígito de distância de uma conhecida
+FORA_VOCABULARIO = ["2541", "4771", "9446"]
+LETREIROS_DIR = "letreiros"
+SINTETICOS_POR_LINHA = 25
+
+
+def carregar_letreiros(diretorio):
+    """Lista (linha, recorte) a partir dos arquivos do diretório"""
+    letreiros = []
+    for caminho in sorted(glob.glob(os.path.join(diretorio, "*"))):
+        linha = os.path.basename(caminho).split("_")[0]
+        img = cv2.imread(caminho)
+        if img is None or not linha.isdigit():
+            continue
+        letreiros.append((linha, img))
+    return letreiros
+
+
+def gerar_letreiros():
+    """Letreiros sintéticos: número em LED laranja + destino, com ruído"""
+    rng = np.random.default_rng(0)
+    # Nenhuma igual às dos templates (SIMPLEX/DUPLEX/TRIPLEX retos)
+    fontes = [
+        cv2.FONT_HERSHEY_COMPLEX,
+        cv2.FONT_HERSHEY_SIMPLEX | cv2.FONT_ITALIC,
+        cv2.FONT_HERSHEY_DUPLEX | cv2.FONT_ITALIC,
+    ]
+    letreiros = []
+    
+    for linha in LINHAS + FORA_VOCABULARIO:
+        for _ in range(SINTETICOS_POR_LINHA):
+            img = np.zeros((90, 320, 3), dtype=np.uint8)
+            escala = rng.uniform(1.4, 2.0)
+            cv2.putText(img, linha, (int(rng.integers(5, 30)), 65),
+                        fontes[rng.integers(len(fontes))], escala, (0, 170, 255), int(rng.integers(2, 5)))
+            cv2.putText(img, "CONDE DA BOA VISTA", (150, 80),
+                        cv2.FONT_HERSHEY_PLAIN, 0.8, (0, 170, 255), 1)
+            ruido = rng.normal(0, 12, img.shape)
+            img = np.clip(img + ruido, 0, 255).astype(np.uint8)
+            letreiros.append((linha, cv2.GaussianBlur(img, (3, 3), 0)))
+    
+    return letreiros
+
+
+def medir(nome, ler, letreiros):
+    """
+    Roda um leitor em todos os letreiros e imprime latência e acerto
+    
+    Letreiros de linhas conhecidas contam acerto/erro/sem leitura; os de
+    fora do vocabulário contam falso positivo (leu alguma linha conhecida).
+    """
+    tempos = []
+    acertos = erros = vazios = falsos = conhecidas = 0
+    
+    for linha, img in letreiros:
+        inicio = time.perf_counter()
+        lida = ler(img)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        
+        if linha not in LINHAS:
+            falsos += lida is not None
+            continue
+        
+        conhecidas += 1
+        if lida is None:
+            vazios += 1
+        elif lida == linha:
+            acertos += 1
+        else:
+            erros += 1
+    
+    fora = len(letreiros) - conhecidas
+    print(
+        f"{nome:<22} média {np.mean(tempos):7.1f} ms | p95 {np.percentile(tempos, 95):7.1f} ms | "
+        f"acerto {acertos / max(conhecidas, 1):6.1%} | erro {erros / max(conhecidas, 1):6.1%} | "
+        f"sem leitura {vazios / max(conhecidas, 1):6.1%} | falso positivo {falsos / max(fora, 1):6.1%}"
+    )
+
+
+def main():
+    diretorio = sys.argv[1] if len(sys.argv) > 1 else LETREIROS_DIR
+    
+    if os.path.isdir(diretorio):
+        letreiros = carregar_letreiros(diretorio)
+        print(f"📂 {len(letreiros)} letreiros de {diretorio}")
+    else:
+        letreiros = gerar_letreiros()
+        print(f"⚠️  {diretorio} não encontrado, usando {len(letreiros)} letreiros sintéticos")
+    
+    if not letreiros:
+        print("⚠️  Nenhum letreiro para testar")
+        return
+    
+    reconhecedor = ReconhecedorLinha(LINHAS)
+    
+    def ler_digitos(img):
+        leituras = reconhecedor.ler(img)
+        return leituras[0][0] if leituras else None
+    
+    try:
+        import easyocr
+        reader = easyocr.Reader(['pt', 'en'], gpu=False)
+    except ImportError:
+        reader = None
+        print("⚠️  EasyOCR não disponível, medindo só o leitor de dígitos")
+    
+    def ler_easyocr(img):
+        leituras = leituras_validas(reader.readtext(preprocessar_letreiro(img)), LINHAS, conf_min=0.4)
+        return leituras[0][0] if leituras else None
+    
+    def ler_com_fallback(img):
+        return ler_digitos(img) or ler_easyocr(img)
+    
+    print("=" * 125)
+    medir("dígitos", ler_digitos, letreiros)
+    if reader is not None:
+        medir("easyocr", ler_easyocr, letreiros)
+        medir("dígitos + easyocr", ler_com_fallback, letreiros)
+    print("=" * 125)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from src.brt.motion import FiltroMovimento
+
 # Se servidor estiver no Codespace:
 SERVIDOR_URL = "https://effective-halibut-vpvqv7w59rhxx65-5000.app.github.dev"
 
@@ -5,4 +7,21 @@ SERVIDOR_URL = "https://effective-halibut-vpvqv7w59rhxx65-5000.app.github.dev"
 SERVIDOR_URL = "http://localhost:5000"
 
 # Timing
-INTERVALO_CAPTURA = 5  # Ajustar conforme necessário
\ No newline at end of file
+INTERVALO_CAPTURA = 5  # Ajustar conforme necessário
+
+# Filtro de movimento: só envia o frame se a cena mudou
+FILTRO_MOVIMENTO = True
+LIMIAR_MOVIMENTO = 0.01  # Fração mínima de pixels alterados
+
+filtro_movimento = FiltroMovimento(fracao_min=LIMIAR_MOVIMENTO) if FILTRO_MOVIMENTO else None
+
+
+def deve_enviar(frame, camera_id="webcam"):
+    """True se o frame deve ir para o servidor (cena mudou ou filtro desligado)"""
+    return filtro_movimento is None or filtro_movimento.mudou(camera_id, frame)
+
+
+def frame_enviado(frame, camera_id="webcam"):
+    """Chamar depois que o servidor aceitou o frame (vira a referência do filtro)"""
+    if filtro_movimento is not None:
+        filtro_movimento.confirmar(camera_id, frame)
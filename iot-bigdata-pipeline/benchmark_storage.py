@@ -0,0 +1,71 @@
+"""
+Benchmark de escrita: MongoDBStore.save (um insert_one por leitura)
+x MongoDBStore.save_many (insert_many em lotes)
+"""
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from src.core.storage import MongoDBStore
+
+TOTAL_LEITURAS = 2000
+TAMANHOS_LOTE = [100, 500, 1000]
+
+
+def gerar_leituras(total):
+    """Leituras sintéticas no formato do DHT22"""
+    return [
+        {
+            "sensor_id": f"dht22_{i % 10}",
+            "temperature": round(random.uniform(20, 35), 1),
+            "humidity": round(random.uniform(40, 90), 1),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "benchmark": True
+        }
+        for i in range(total)
+    ]
+
+
+def medir(nome, salvar, total):
+    """Salva leituras novas (o insert grava _id nos dicts) e mede só a escrita"""
+    leituras = gerar_leituras(total)
+    inicio = time.perf_counter()
+    salvos = salvar(leituras)
+    duracao = time.perf_counter() - inicio
+    print(f"📊 {nome:<28} {salvos}/{total} em {duracao:6.2f}s → {salvos / duracao:8.0f} leituras/s")
+    return duracao
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else TOTAL_LEITURAS
+    store = MongoDBStore()
+    
+    if store.simulation_mode:
+        print("⚠️  MongoDB indisponível: medindo o modo simulação (sem rede)")
+    
+    resultados = {}
+    resultados["save"] = medir(
+        "save (insert_one)",
+        lambda leituras: sum(1 for data in leituras if store.save(data)),
+        total
+    )
+    
+    for tamanho in TAMANHOS_LOTE:
+        resultados[tamanho] = medir(
+            f"save_many (lote={tamanho})",
+            lambda leituras: store.save_many(leituras, batch_size=tamanho),
+            total
+        )
+    
+    melhor = min(TAMANHOS_LOTE, key=resultados.get)
+    print(f"🚀 save_many (lote={melhor}) foi {resultados['save'] / resultados[melhor]:.1f}x mais rápido")
+    
+    # Remover as leituras do benchmark
+    if not store.simulation_mode:
+        removidos = store.collection.delete_many({"benchmark": True}).deleted_count
+        print(f"🧹 {removidos} leituras de benchmark removidas")
+
+
+if __name__ == "__main__":
+    main()
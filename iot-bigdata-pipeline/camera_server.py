@@ -11,19 +11,16 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 import os
 import sys
+import time
+import threading
+import importlib.util
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import uuid
 
-# OCR
-try:
-    import easyocr
-    OCR_AVAILABLE = True
-    reader = easyocr.Reader(['pt', 'en'], gpu=False)
-    print("✅ EasyOCR carregado")
-except ImportError:
-    OCR_AVAILABLE = False
+# OCR (o import do easyocr carrega o torch; só acontece no aquecimento)
+OCR_AVAILABLE = importlib.util.find_spec("easyocr") is not None
+if not OCR_AVAILABLE:
     print("⚠️  EasyOCR não disponível")
 
 # ================================================
@@ -50,10 +47,51 @@ deteccoes_collection = db["deteccoes"]
 logs_collection = db["logs_sistema"]
 linhas_collection = db["linhas_conhecidas"]
 
-# YOLOv8
-print("📦 Carregando modelo YOLOv8...")
-model = YOLO("yolov8n.pt")
-print("✅ YOLOv8 carregado")
+# YOLOv8 + EasyOCR: carregados numa thread para o Flask abrir a porta
+# na hora (o health check do Render não espera o cold start dos modelos)
+RETRY_AFTER_S = int(os.getenv("RETRY_AFTER_S", 2))
+
+model = None
+reader = None
+estado_modelos = {"estado": "aquecendo", "inicio": time.monotonic()}
+
+
+def carregar_modelos():
+    """Carrega YOLO + EasyOCR e roda uma inferência de aquecimento"""
+    global model, reader
+    
+    try:
+        from ultralytics import YOLO
+        
+        print("📦 Carregando modelo YOLOv8...")
+        yolo = YOLO("yolov8n.pt")
+        print("✅ YOLOv8 carregado")
+        
+        leitor = None
+        if OCR_AVAILABLE:
+            import easyocr
+            leitor = easyocr.Reader(['pt', 'en'], gpu=False)
+            print("✅ EasyOCR carregado")
+        
+        # Aquecimento: a 1ª requisição não paga alocação/inicialização
+        yolo(np.zeros((640, 640, 3), dtype=np.uint8), conf=0.5, verbose=False)
+        if leitor is not None:
+            letreiro = np.full((64, 200), 255, dtype=np.uint8)
+            cv2.putText(letreiro, "437", (20, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+            leitor.readtext(letreiro)
+        
+        model, reader = yolo, leitor
+        estado_modelos["estado"] = "pronto"
+        estado_modelos["carregado_em_s"] = round(time.monotonic() - estado_modelos["inicio"], 1)
+        print(f"✅ Modelos prontos em {estado_modelos['carregado_em_s']}s")
+    
+    except Exception as e:
+        estado_modelos["estado"] = "erro"
+        estado_modelos["erro"] = str(e)
+        print(f"❌ Falha ao carregar modelos: {e}")
+
+
+threading.Thread(target=carregar_modelos, name="aquecimento-modelos", daemon=True).start()
 
 # Linhas conhecidas do BRT Recife
 LINHAS_CONHECIDAS = {
@@ -226,11 +264,19 @@ def home():
 
 @app.route("/health", methods=["GET"])
 def health():
-    """Health check"""
+    """Health check (responde 200 mesmo aquecendo, para o deploy não falhar)"""
+    modelos = {k: v for k, v in estado_modelos.items() if k != "inicio"}
+    
+    if estado_modelos["estado"] == "pronto":
+        status = "online"
+    else:
+        status = "error" if estado_modelos["estado"] == "erro" else "warming"
+    
     return jsonify({
-        "status": "online",
+        "status": status,
         "service": "BRT Detection Server",
         "yolo": "active",
+        "modelos": modelos,
         "ocr": "active" if OCR_AVAILABLE else "inactive",
         "mongodb": "connected",
         "timestamp": datetime.now(timezone.utc).isoformat()
@@ -251,6 +297,17 @@ def upload_image():
         if "imagem" not in request.files:
             return jsonify({"error": "Imagem não enviada"}), 400
         
+        # Modelos ainda carregando: o cliente tenta de novo
+        if estado_modelos["estado"] != "pronto":
+            resposta = jsonify({
+                "status": "warming",
+                "error": "Modelos carregando, tente novamente",
+                "retry_after_s": RETRY_AFTER_S
+            })
+            resposta.status_code = 503
+            resposta.headers["Retry-After"] = str(RETRY_AFTER_S)
+            return resposta
+        
         file = request.files["imagem"]
         parada_origem = request.form.get("parada_origem", "A")
         parada_destino = request.form.get("parada_destino", "B")
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 
 class ISensor(ABC):
     """Interface for sensors following Interface Segregation Principle"""
@@ -20,4 +20,12 @@ class IDataStore(ABC):
     
     @abstractmethod
     def save(self, data: Dict[str, Any]):
-        pass
\ No newline at end of file
+        pass
+    
+    def save_many(self, items: Iterable[Dict[str, Any]]) -> int:
+        """Save several records, returning how many were saved.
+        
+        Default implementation calls save() per record; stores with a
+        bulk write path should override it.
+        """
+        return sum(1 for data in items if self.save(data))
\ No newline at end of file
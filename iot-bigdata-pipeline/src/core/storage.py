@@ -1,12 +1,12 @@
-from typing import Dict, Any
+from typing import Dict, Any, Iterable
 from src.core.interfaces import IDataStore
-from src.config import Config
 import ssl
 
 class MongoDBStore(IDataStore):
     """MongoDB storage - Conexão REAL com MongoDB Atlas"""
     
-    def __init__(self):
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
         self.client = None
         self.db = None
         self.collection = None
@@ -89,6 +89,48 @@ class MongoDBStore(IDataStore):
             print(f"❌ Erro ao salvar no MongoDB: {e}")
             return False
     
+    def save_many(self, items: Iterable[Dict[str, Any]], batch_size: int = None) -> int:
+        """Save em lote: um insert_many a cada batch_size leituras
+        
+        Returns:
+            int: quantidade de leituras salvas
+        """
+        tamanho = batch_size or self.batch_size
+        salvos = 0
+        lote = []
+        
+        for data in items:
+            if data is None:
+                continue
+            
+            lote.append(data)
+            if len(lote) >= tamanho:
+                salvos += self._save_lote(lote)
+                lote = []
+        
+        if lote:
+            salvos += self._save_lote(lote)
+        
+        return salvos
+    
+    def _save_lote(self, lote):
+        """insert_many de um lote (ordered=False: um documento ruim não para os outros)"""
+        try:
+            if self.simulation_mode:
+                print(f"💾 [SIMULAÇÃO] lote de {len(lote)} leituras")
+                return len(lote)
+            else:
+                # INSERÇÃO REAL NO MONGODB (uma ida ao servidor por lote)
+                result = self.collection.insert_many(lote, ordered=False)
+                print(f"✅ {len(result.inserted_ids)} DADOS SALVOS NO MONGODB!")
+                return len(result.inserted_ids)
+                
+        except Exception as e:
+            # BulkWriteError informa quantos entraram antes do erro
+            inseridos = (getattr(e, "details", None) or {}).get("nInserted", 0)
+            print(f"❌ Erro ao salvar lote no MongoDB ({inseridos}/{len(lote)} salvos): {e}")
+            return inseridos
+    
     def __del__(self):
         if self.client and not self.simulation_mode:
             self.client.close()
\ No newline at end of file
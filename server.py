@@ -6,26 +6,53 @@ Repositório: github.com/fabricioestevam/bigdata
 Deploy: render.com
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 from datetime import datetime, timedelta, timezone
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import OperationFailure, PyMongoError
 from dotenv import load_dotenv
 import os
 import sys
+import atexit
+import signal
+import json
+import importlib.util
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import uuid
+import time
+import threading
+from concurrent.futures import TimeoutError as InferenciaTimeoutError
 
-# OCR
-try:
-    import easyocr
-    OCR_AVAILABLE = True
-    reader = easyocr.Reader(['pt', 'en'], gpu=False)
-    print("✅ EasyOCR carregado")
-except ImportError:
-    OCR_AVAILABLE = False
+from src.brt.scheduler import InferenceScheduler, FilaCheiaError
+from src.brt.pool import DetectorPool
+from src.brt.ocr_cache import CacheOCR, hash_letreiro
+from src.brt.motion import FiltroMovimento
+from src.brt.tracker import RastreadorOnibus
+from src.brt.backends import carregar_yolo
+from src.brt.perfil import PerfilDeteccao
+from src.brt.digitos import ReconhecedorLinha
+from src.brt.aquecimento import CarregadorModelos, aquecer_modelos
+from src.brt.jobs import RegistroJobs
+from src.brt.stream import GerenciadorStreams, mascarar_url, validar_url_stream
+from src.brt.escrita import EscritorMongo
+from src.brt.periodica import TarefaPeriodica
+from src.brt.indices import garantir_indices_deteccoes, consulta_previsoes
+from src.brt.quadro import QuadroChegadas
+from src.brt.contadores import ContadoresDeteccoes
+from src.brt.rollup import AgregadorDeteccoes, GRANULARIDADES, consultar_baldes
+from src.brt.tempo_viagem import EstimadorTempoViagem
+from src.brt.letreiro import (
+    recortar_letreiro,
+    preprocessar_letreiro,
+    leituras_validas,
+    empilhar_letreiros,
+)
+
+# OCR (o import do easyocr carrega o torch; só acontece no aquecimento)
+OCR_AVAILABLE = importlib.util.find_spec("easyocr") is not None
+if not OCR_AVAILABLE:
     print("⚠️  EasyOCR não disponível")
 
 # ================================================
@@ -44,18 +71,114 @@ if not MONGO_URI:
     print("❌ ERRO: MONGO_URI não configurado!")
     sys.exit(1)
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
+# Agendador de inferência (micro-lotes + fila limitada)
+INFERENCIA_MAX_LOTE = int(os.getenv("INFERENCIA_MAX_LOTE", 8))
+INFERENCIA_MAX_ESPERA_MS = int(os.getenv("INFERENCIA_MAX_ESPERA_MS", 50))
+INFERENCIA_MAX_FILA = int(os.getenv("INFERENCIA_MAX_FILA", 32))
+INFERENCIA_TIMEOUT_S = float(os.getenv("INFERENCIA_TIMEOUT_S", 60))
+RETRY_AFTER_S = int(os.getenv("RETRY_AFTER_S", 2))
 
-# Collections
-deteccoes_collection = db["deteccoes"]
-logs_collection = db["logs_sistema"]
-linhas_collection = db["linhas_conhecidas"]
+# Upload em lote (rajadas das câmeras); por padrão uma rajada cabe num
+# micro-lote (uma chamada do YOLO)
+MAX_IMAGENS_LOTE = int(os.getenv("MAX_IMAGENS_LOTE", INFERENCIA_MAX_LOTE))
+
+# Upload assíncrono (POST /upload?async=1 → GET /jobs/<id>)
+JOBS_MAX = int(os.getenv("JOBS_MAX", 1000))
+JOBS_TTL_S = float(os.getenv("JOBS_TTL_S", 300))
+SSE_KEEPALIVE_S = float(os.getenv("SSE_KEEPALIVE_S", 15))
+
+# Ingestão de streams MJPEG/RTSP (POST /streams)
+STREAMS_MAX = int(os.getenv("STREAMS_MAX", 4))
+STREAM_FPS = float(os.getenv("STREAM_FPS", 1.0))
+STREAM_JANELA_REPETICAO_S = float(os.getenv("STREAM_JANELA_REPETICAO_S", 60))
+# Hosts de câmera aceitos no POST /streams (vírgula; vazio = streams desativados)
+STREAMS_HOSTS_PERMITIDOS = {
+    h.strip().lower() for h in os.getenv("STREAMS_HOSTS_PERMITIDOS", "").split(",") if h.strip()
+}
+
+# Escrita em lote no MongoDB (detecções e logs fora do caminho da requisição)
+ESCRITA_MAX_LOTE = int(os.getenv("ESCRITA_MAX_LOTE", 100))
+ESCRITA_INTERVALO_S = float(os.getenv("ESCRITA_INTERVALO_S", 1.0))
+ESCRITA_MAX_FILA = int(os.getenv("ESCRITA_MAX_FILA", 10000))
+ESCRITA_TIMEOUT_S = float(os.getenv("ESCRITA_TIMEOUT_S", 2.0))
+
+# Expiração das detecções: índice TTL no MongoDB + tarefa em segundo plano
+# (a chegada só é registrada enquanto a detecção existe: o TTL limita a
+# viagem mais longa que o tempo de viagem aprende, ver TEMPO_VIAGEM_MAX_MIN)
+DETECCAO_TTL_S = int(os.getenv("DETECCAO_TTL_S", 3 * 60 * 60))
+LIMITE_ATRASO = timedelta(minutes=2)  # em_rota com previsão mais velha que isso expira
+EXPIRAR_INTERVALO_S = float(os.getenv("EXPIRAR_INTERVALO_S", 60))
+
+# Cache do quadro de chegadas por parada (recarga do banco a cada N segundos)
+QUADRO_TTL_S = float(os.getenv("QUADRO_TTL_S", 30))
+
+# Contadores do /stats em memória, recalculados no banco a cada N segundos
+ESTATISTICAS_RECONCILIAR_S = float(os.getenv("ESTATISTICAS_RECONCILIAR_S", 300))
+
+# Rollup das detecções por minuto/hora/dia (gravado a cada N segundos)
+ROLLUP_INTERVALO_S = float(os.getenv("ROLLUP_INTERVALO_S", 30))
+
+# Tempo de viagem aprendido (EWMA por linha × origem → destino × hora)
+TEMPO_VIAGEM_ALFA = float(os.getenv("TEMPO_VIAGEM_ALFA", 0.2))
+TEMPO_VIAGEM_MIN_AMOSTRAS = int(os.getenv("TEMPO_VIAGEM_MIN_AMOSTRAS", 3))
+# Faixa plausível de uma viagem (minutos); fora dela a chegada não entra na média
+TEMPO_VIAGEM_MIN_MIN = float(os.getenv("TEMPO_VIAGEM_MIN_MIN", 1.0))
+TEMPO_VIAGEM_MAX_MIN = float(os.getenv("TEMPO_VIAGEM_MAX_MIN", 180))
+if TEMPO_VIAGEM_MAX_MIN * 60 > DETECCAO_TTL_S:
+    print(f"⚠️  TEMPO_VIAGEM_MAX_MIN={TEMPO_VIAGEM_MAX_MIN:g} passa do TTL das detecções "
+          f"({DETECCAO_TTL_S}s); usando {DETECCAO_TTL_S / 60:g} min")
+    TEMPO_VIAGEM_MAX_MIN = DETECCAO_TTL_S / 60
+TEMPO_VIAGEM_SALVAR_S = float(os.getenv("TEMPO_VIAGEM_SALVAR_S", 60))
+
+# Change stream do MongoDB (replica set/Atlas) para atualizar o quadro com
+# detecções de outros processos; sem suporte, só as do próprio processo
+QUADRO_CHANGE_STREAM = os.getenv("QUADRO_CHANGE_STREAM", "true").lower() in ("1", "true", "sim")
+
+# Detecção no próprio processo web (0) ou em N processos dedicados
+DETECTOR_WORKERS = int(os.getenv("DETECTOR_WORKERS", 0))
+
+# Backend do YOLO em CPU: pytorch, onnx ou openvino (volta para pytorch se falhar)
+YOLO_BACKEND = os.getenv("YOLO_BACKEND", "pytorch").lower()
+YOLO_INT8 = os.getenv("YOLO_INT8", "false").lower() in ("1", "true", "sim")
+
+# Perfil de detecção: só a classe "bus", imgsz e ROI por câmera
+# ROI_CAMERAS='{"camera_A": [0, 120, 1280, 600]}'  (x1, y1, x2, y2)
+YOLO_SOMENTE_ONIBUS = os.getenv("YOLO_SOMENTE_ONIBUS", "true").lower() in ("1", "true", "sim")
+YOLO_IMGSZ = int(os.getenv("YOLO_IMGSZ", 640))
+YOLO_CONF = float(os.getenv("YOLO_CONF", 0.5))
+ROI_CAMERAS = json.loads(os.getenv("ROI_CAMERAS", "{}"))
+
+# Maior frame que cabe num slot do anel de memória compartilhada (modo pool)
+FRAME_SLOT_LARGURA = int(os.getenv("FRAME_SLOT_LARGURA", 1280))
+FRAME_SLOT_ALTURA = int(os.getenv("FRAME_SLOT_ALTURA", 720))
+
+# Cache de OCR por hash perceptual do letreiro
+OCR_CACHE_MAX_ITENS = int(os.getenv("OCR_CACHE_MAX_ITENS", 256))
+OCR_CACHE_TTL_S = float(os.getenv("OCR_CACHE_TTL_S", 120))
+OCR_CACHE_DISTANCIA = int(os.getenv("OCR_CACHE_DISTANCIA", 2))
+
+# Filtro de movimento: pula o YOLO quando a cena da câmera não mudou
+FILTRO_MOVIMENTO = os.getenv("FILTRO_MOVIMENTO", "false").lower() in ("1", "true", "sim")
+LIMIAR_MOVIMENTO = float(os.getenv("LIMIAR_MOVIMENTO", 0.01))
+
+# Rastreamento de ônibus entre frames (OCR uma vez por passagem)
+RASTREIO_IOU_MIN = float(os.getenv("RASTREIO_IOU_MIN", 0.3))
+RASTREIO_MAX_AUSENCIA_S = float(os.getenv("RASTREIO_MAX_AUSENCIA_S", 10))
+RASTREIO_MAX_TENTATIVAS_OCR = int(os.getenv("RASTREIO_MAX_TENTATIVAS_OCR", 5))
+LIMIAR_VOTOS_OCR = float(os.getenv("LIMIAR_VOTOS_OCR", 0.8))
 
-# YOLOv8
-print("📦 Carregando modelo YOLOv8...")
-model = YOLO("yolov8n.pt")
-print("✅ YOLOv8 carregado")
+# Leitura dos dígitos por templates antes do EasyOCR (fallback com confiança baixa)
+RECONHECEDOR_DIGITOS = os.getenv("RECONHECEDOR_DIGITOS", "true").lower() in ("1", "true", "sim")
+LIMIAR_DIGITOS = float(os.getenv("LIMIAR_DIGITOS", 0.75))
+DIGITOS_TEMPLATES_DIR = os.getenv("DIGITOS_TEMPLATES_DIR")
+
+# Parâmetros de inferência do YOLO (iguais no processo web e nos workers)
+perfil_deteccao = PerfilDeteccao(
+    somente_onibus=YOLO_SOMENTE_ONIBUS,
+    imgsz=YOLO_IMGSZ,
+    conf=YOLO_CONF,
+    rois={camera: tuple(roi) for camera, roi in ROI_CAMERAS.items()}
+)
 
 # Linhas conhecidas do BRT Recife
 LINHAS_CONHECIDAS = {
@@ -81,12 +204,114 @@ LINHAS_CONHECIDAS = {
     }
 }
 
+# Leitor de dígitos restrito às linhas conhecidas
+reconhecedor_digitos = None
+if RECONHECEDOR_DIGITOS:
+    reconhecedor_digitos = ReconhecedorLinha(
+        list(LINHAS_CONHECIDAS.keys()),
+        limiar=LIMIAR_DIGITOS,
+        diretorio_templates=DIGITOS_TEMPLATES_DIR
+    )
+
+# Pool de detecção criado antes do MongoClient e dos escritores em lote:
+# os workers saem de um fork, e fork de processo com threads (monitor do
+# pymongo, escritores...) pode herdar locks presos e travar o filho
+pool_deteccao = None
+if DETECTOR_WORKERS > 0:
+    pool_deteccao = DetectorPool(
+        list(LINHAS_CONHECIDAS.keys()),
+        DETECTOR_WORKERS,
+        max_fila=INFERENCIA_MAX_FILA,
+        bytes_por_slot=FRAME_SLOT_LARGURA * FRAME_SLOT_ALTURA * 3,
+        opcoes_detector={
+            "backend": YOLO_BACKEND,
+            "int8": YOLO_INT8,
+            "perfil": perfil_deteccao,
+            "reconhecedor": reconhecedor_digitos
+        }
+    )
+
+# tz_aware: datas BSON voltam como datetime com fuso (UTC)
+client = MongoClient(MONGO_URI, tz_aware=True)
+db = client[DB_NAME]
+
+# Collections
+deteccoes_collection = db["deteccoes"]
+logs_collection = db["logs_sistema"]
+linhas_collection = db["linhas_conhecidas"]
+rollup_collection = db["deteccoes_rollup"]
+tempos_viagem_collection = db["tempos_viagem"]
+
+# Inserções vão para uma fila e são gravadas em lote por uma thread
+escritor_deteccoes = EscritorMongo(
+    deteccoes_collection,
+    max_lote=ESCRITA_MAX_LOTE,
+    intervalo_s=ESCRITA_INTERVALO_S,
+    max_fila=ESCRITA_MAX_FILA
+)
+escritor_logs = EscritorMongo(
+    logs_collection,
+    max_lote=ESCRITA_MAX_LOTE,
+    intervalo_s=ESCRITA_INTERVALO_S,
+    max_fila=ESCRITA_MAX_FILA
+)
+
+# YOLOv8 + EasyOCR (no modo pool cada worker carrega os seus)
+model = None
+reader = None
+
+
+def carregar_modelos():
+    """Carrega e aquece YOLO + EasyOCR (roda na thread de aquecimento)"""
+    global model, reader
+    
+    print(f"📦 Carregando modelo YOLOv8 ({YOLO_BACKEND})...")
+    yolo = carregar_yolo(YOLO_BACKEND, int8=YOLO_INT8)
+    print("✅ YOLOv8 carregado")
+    
+    leitor = None
+    if OCR_AVAILABLE:
+        import easyocr
+        leitor = easyocr.Reader(['pt', 'en'], gpu=False)
+        print("✅ EasyOCR carregado")
+    
+    aquecer_modelos(yolo, leitor, perfil_deteccao)
+    model, reader = yolo, leitor
+    return model, reader
+
+
+# O Flask sobe sem esperar os modelos; /health responde "warming" até lá
+carregador_modelos = CarregadorModelos(carregar_modelos)
+if DETECTOR_WORKERS == 0:
+    carregador_modelos.iniciar()
+
+# Letreiros já lidos (frames repetidos de um ônibus parado não repetem OCR)
+cache_ocr = CacheOCR(
+    max_itens=OCR_CACHE_MAX_ITENS,
+    ttl_s=OCR_CACHE_TTL_S,
+    distancia_max=OCR_CACHE_DISTANCIA
+)
+
+# Última cena processada de cada câmera (só com FILTRO_MOVIMENTO ativo)
+filtro_movimento = FiltroMovimento(fracao_min=LIMIAR_MOVIMENTO) if FILTRO_MOVIMENTO else None
+
+# Trilhas de ônibus por câmera (só no modo processo web; no modo pool os
+# frames de uma câmera se espalham entre processos)
+rastreador = RastreadorOnibus(
+    iou_min=RASTREIO_IOU_MIN,
+    max_ausencia_s=RASTREIO_MAX_AUSENCIA_S,
+    max_tentativas_ocr=RASTREIO_MAX_TENTATIVAS_OCR,
+    limiar_votos=LIMIAR_VOTOS_OCR
+)
+
 print("\n" + "=" * 70)
 print("🚍 SERVIDOR BRT RECIFE - RENDER.COM")
 print("=" * 70)
 print(f"📦 Database: {DB_NAME}")
 print(f"🔍 OCR: {'✅ Ativo' if OCR_AVAILABLE else '❌ Inativo'}")
+print(f"🔢 Leitor de dígitos: {'✅ Ativo' if reconhecedor_digitos else '❌ Inativo'}")
 print(f"🚌 Linhas: {len(LINHAS_CONHECIDAS)}")
+print(f"⚙️  Detecção: {f'{DETECTOR_WORKERS} processos' if DETECTOR_WORKERS else 'processo web'}")
 print("=" * 70 + "\n")
 
 
@@ -100,7 +325,7 @@ def gerar_id_deteccao():
 
 
 def salvar_log(tipo, mensagem, detalhes=None):
-    """Salva log no MongoDB"""
+    """Salva log no MongoDB (em lote; com a fila cheia o log é descartado)"""
     try:
         log = {
             "tipo": tipo,
@@ -108,101 +333,673 @@ def salvar_log(tipo, mensagem, detalhes=None):
             "detalhes": detalhes,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
-        logs_collection.insert_one(log)
+        escritor_logs.inserir(log, bloquear=False)
     except:
         pass
 
 
-def limpar_deteccoes_antigas():
-    """Remove detecções com mais de 30 minutos"""
-    limite = datetime.now(timezone.utc) - timedelta(minutes=30)
-    deteccoes_collection.delete_many({
-        "hora_deteccao": {"$lt": limite.isoformat()}
-    })
+def garantir_indices():
+    """
+    Índices compostos das consultas de /previsoes e das chegadas, e
+    o índice TTL: o próprio MongoDB remove detecções DETECCAO_TTL_S
+    segundos depois de hora_deteccao (só funciona com datetime BSON)
+    """
+    garantir_indices_deteccoes(deteccoes_collection, ttl_s=DETECCAO_TTL_S)
+    print("✅ Índices das detecções garantidos")
+
+
+def expirar_deteccoes():
+    """
+    Tarefa periódica: marca como expiradas as detecções em rota com a
+    previsão de chegada vencida há mais de LIMITE_ATRASO
+    
+    Também remove detecções antigas gravadas com datas em texto ISO
+    (anteriores ao índice TTL, que as ignora).
+    """
+    agora = datetime.now(timezone.utc)
+    
+    expiradas = deteccoes_collection.update_many(
+        {"status": "em_rota", "previsao_chegada": {"$lt": agora - LIMITE_ATRASO}},
+        {"$set": {"status": "expirado"}}
+    ).modified_count
+    contadores_deteccoes.mudar_status("em_rota", "expirado", expiradas)
+    
+    limite = agora - timedelta(seconds=DETECCAO_TTL_S)
+    legadas = deteccoes_collection.delete_many({
+        "hora_deteccao": {"$type": "string", "$lt": limite.isoformat()}
+    }).deleted_count
+    
+    if expiradas or legadas:
+        print(f"🧹 {expiradas} detecções expiradas, {legadas} antigas (texto) removidas")
+
+
+def carregar_quadro(parada_id):
+    """
+    Detecções em rota da parada para o QuadroChegadas: as ainda na fila de
+    escrita e as do banco (nessa ordem, para nenhuma gravada no meio ficar
+    de fora; repetidas são descartadas pelo quadro)
+    """
+    desde = datetime.now(timezone.utc) - LIMITE_ATRASO
+    pendentes = escritor_deteccoes.pendentes(
+        lambda d: d["parada_destino"] == parada_id
+        and d["status"] == "em_rota"
+        and d["previsao_chegada"] > desde
+    )
+    return pendentes + list(consulta_previsoes(deteccoes_collection, parada_id, desde=desde))
+
+
+quadro_chegadas = QuadroChegadas(carregar_quadro, ttl_s=QUADRO_TTL_S, limite_atraso=LIMITE_ATRASO)
+_previsoes_montadas = {}  # parada -> ((versão, segundo), corpo)
+
+# Totais do /stats; atualizados no registro/expiração e reconciliados
+# periodicamente (TTL e outros processos também mexem na collection)
+contadores_deteccoes = ContadoresDeteccoes()
+
+# Baldes por minuto/hora/dia para análises históricas (/analytics)
+agregador_deteccoes = AgregadorDeteccoes(rollup_collection)
+
+# Previsão de chegada: EWMA do tempo de viagem observado em cada trecho
+estimador_viagem = EstimadorTempoViagem(
+    alfa=TEMPO_VIAGEM_ALFA,
+    min_amostras=TEMPO_VIAGEM_MIN_AMOSTRAS,
+    min_min=TEMPO_VIAGEM_MIN_MIN,
+    max_min=TEMPO_VIAGEM_MAX_MIN
+)
+
+
+def carregar_tempos_viagem():
+    """Restaura as médias salvas (na subida; o índice garante uma por chave)"""
+    tempos_viagem_collection.create_index(
+        [("linha", 1), ("origem", 1), ("destino", 1), ("faixa", 1)],
+        name="trecho_faixa",
+        unique=True
+    )
+    estimador_viagem.carregar(tempos_viagem_collection.find({}, {"_id": 0}))
+
+
+def salvar_tempos_viagem():
+    """Grava as médias alteradas desde o último salvamento (um upsert cada)"""
+    docs = estimador_viagem.exportar_alteradas()
+    if not docs:
+        return
+    
+    try:
+        tempos_viagem_collection.bulk_write([
+            UpdateOne(
+                {"linha": d["linha"], "origem": d["origem"], "destino": d["destino"], "faixa": d["faixa"]},
+                {"$set": {"media_min": d["media_min"], "amostras": d["amostras"]}},
+                upsert=True
+            )
+            for d in docs
+        ], ordered=False)
+    except Exception:
+        estimador_viagem.marcar_alteradas(docs)
+        raise
+
+
+def registrar_chegada(deteccao_id):
+    """
+    Marca a chegada de um ônibus e ensina o tempo de viagem observado
+    
+    Aceita detecções em rota ou já expiradas (ônibus atrasado é justamente
+    a amostra que mais corrige a estimativa).
+    
+    Returns:
+        dict: corpo da resposta, ou None se a detecção não existe / já chegou
+    
+    Raises:
+        TimeoutError: se a detecção ainda está na fila de escrita depois de
+            ESCRITA_TIMEOUT_S (existe, mas ainda não dá para atualizar)
+    """
+    # Ainda na fila de escrita: grava antes de atualizar
+    if escritor_deteccoes.pendentes(lambda d: d["deteccao_id"] == deteccao_id):
+        if not escritor_deteccoes.flush(timeout=ESCRITA_TIMEOUT_S):
+            raise TimeoutError("Detecção ainda na fila de escrita")
+    
+    agora = datetime.now(timezone.utc)
+    det = deteccoes_collection.find_one_and_update(
+        {"deteccao_id": deteccao_id, "status": {"$in": ["em_rota", "expirado"]}},
+        {"$set": {"status": "chegou", "hora_chegada": agora}}
+    )
+    if det is None:
+        return None
+    
+    minutos = (agora - det["hora_deteccao"]).total_seconds() / 60
+    aprendido = estimador_viagem.observar(
+        det["linha"], det["parada_origem"], det["parada_destino"], det["hora_deteccao"], minutos
+    )
+    
+    contadores_deteccoes.mudar_status(det["status"], "chegou")
+    quadro_chegadas.remover(det["parada_destino"], deteccao_id)
+    if aprendido:
+        agregador_deteccoes.registrar_viagem(
+            det["linha"], det["parada_origem"], det["parada_destino"], det["hora_deteccao"], minutos
+        )
+    
+    print(f"🏁 Linha {det['linha']} chegou em {det['parada_destino']} ({minutos:.1f} min)")
+    
+    return {
+        "status": "success",
+        "deteccao_id": deteccao_id,
+        "linha": det["linha"],
+        "tempo_real_min": round(minutos, 1),
+        "tempo_estimado_min": det["tempo_estimado_min"],
+        "aprendido": aprendido
+    }
+
+
+def reconciliar_contadores():
+    """Recalcula os contadores com um $group só (banco + fila de escrita)"""
+    pipeline = [
+        {"$group": {"_id": {"linha": "$linha", "status": "$status"}, "count": {"$sum": 1}}}
+    ]
+    grupos = list(deteccoes_collection.aggregate(pipeline))
+    
+    ids_gravados = None
+    pendentes = escritor_deteccoes.pendentes()
+    if pendentes:
+        # Os que foram gravados durante a agregação já entraram na contagem
+        ids_gravados = {
+            d["_id"] for d in deteccoes_collection.find(
+                {"_id": {"$in": [d["_id"] for d in pendentes]}}, {"_id": 1}
+            )
+        }
+    for d in pendentes:
+        if ids_gravados is None or d["_id"] not in ids_gravados:
+            grupos.append({"_id": {"linha": d["linha"], "status": d["status"]}, "count": 1})
+    
+    contadores_deteccoes.reconciliar(grupos)
+
+
+def montar_previsoes(parada_id):
+    """
+    Corpo do /previsoes/<parada> a partir do quadro em cache
+    
+    O banco só é consultado na primeira leitura da parada e a cada
+    QUADRO_TTL_S. As atrasadas além de LIMITE_ATRASO saem do quadro (e são
+    marcadas como expiradas pela tarefa expirar_deteccoes). O corpo é
+    reaproveitado dentro do mesmo segundo enquanto o quadro não muda, então
+    muitos displays na mesma parada custam uma montagem só.
+    """
+    agora = datetime.now(timezone.utc)
+    chave = (quadro_chegadas.versao(parada_id), int(agora.timestamp()))
+    
+    montado = _previsoes_montadas.get(parada_id)
+    if montado is not None and montado[0] == chave:
+        return montado[1]
+    
+    previsoes = []
+    
+    for previsao_dt, dados in quadro_chegadas.obter(parada_id, agora):
+        minutos_restantes = int((previsao_dt - agora).total_seconds() / 60)
+        
+        previsoes.append({
+            **dados,
+            "minutos": max(0, minutos_restantes),
+            "status": "chegando" if minutos_restantes <= 0 else "em_rota"
+        })
+    
+    corpo = {
+        "parada": parada_id,
+        "total": len(previsoes),
+        "previsoes": previsoes[:10],  # Máximo 10
+        "atualizado_em": agora.strftime("%H:%M:%S")
+    }
+    _previsoes_montadas[parada_id] = (chave, corpo)
+    return corpo
+
+
+def truncar_ms(t):
+    """
+    Datetime com a precisão de uma data BSON (milissegundos): o documento em
+    memória fica igual ao que volta do banco (change stream, recarga do quadro)
+    """
+    return t.replace(microsecond=t.microsecond // 1000 * 1000)
+
+
+def registrar_deteccao(linha, parada_origem, parada_destino, fonte="deteccao_automatica"):
+    """
+    Registra um ônibus detectado na fila da parada de destino
+    
+    Args:
+        linha: número da linha (precisa estar em LINHAS_CONHECIDAS)
+        parada_origem: parada onde o ônibus foi visto
+        parada_destino: parada para onde a previsão é calculada
+        fonte: origem da detecção (ex: "deteccao_automatica", "stream")
+    
+    Returns:
+        dict: dados da detecção registrada (corpo da resposta HTTP)
+    
+    Raises:
+        FilaCheiaError: se a fila de escrita continuar cheia (backpressure)
+    """
+    # Gerar ID único
+    deteccao_id = gerar_id_deteccao()
+    
+    # Calcular previsão (tempo aprendido do trecho; tabela se ainda não há)
+    linha_info = LINHAS_CONHECIDAS[linha]
+    agora = truncar_ms(datetime.now(timezone.utc))
+    tempo_min, estimativa = estimador_viagem.estimar(
+        linha, parada_origem, parada_destino, agora, padrao=linha_info["tempo_medio_min"]
+    )
+    previsao_chegada = truncar_ms(agora + timedelta(minutes=tempo_min))
+    
+    # Salvar detecção
+    deteccao = {
+        "deteccao_id": deteccao_id,
+        "linha": linha,
+        "nome_linha": linha_info["nome"],
+        "parada_origem": parada_origem,
+        "parada_destino": parada_destino,
+        "hora_deteccao": agora,
+        "previsao_chegada": previsao_chegada,
+        "tempo_estimado_min": tempo_min,
+        "estimativa": estimativa,
+        "distancia_km": linha_info["distancia_km"],
+        "status": "em_rota",
+        "fonte": fonte
+    }
+    
+    # Gravada em lote; o _id já é gerado aqui
+    mongodb_id = escritor_deteccoes.inserir(deteccao, timeout=ESCRITA_TIMEOUT_S)
+    
+    # Posição na fila: detecções em rota no quadro da parada (em memória,
+    # já inclui as que ainda estão na fila de escrita)
+    quadro_chegadas.adicionar(parada_destino, deteccao)
+    posicao = quadro_chegadas.contar(parada_destino, agora)
+    
+    contadores_deteccoes.registrar(linha)
+    agregador_deteccoes.registrar(linha, parada_origem, parada_destino, agora)
+    
+    print(f"✅ Detecção registrada: Linha {linha} (posição {posicao})")
+    
+    salvar_log("deteccao", f"Ônibus {linha} detectado", {"deteccao_id": deteccao_id})
+    
+    return {
+        "status": "success",
+        "deteccao_id": deteccao_id,
+        "linha": linha,
+        "nome_linha": linha_info["nome"],
+        "tempo_estimado_min": tempo_min,
+        "estimativa": estimativa,
+        "previsao_chegada": previsao_chegada.isoformat(),
+        "posicao_fila": posicao,
+        "mongodb_id": str(mongodb_id)
+    }
 
 
 # ================================================
 # YOLO + OCR: DETECÇÃO DE LINHA
 # ================================================
 
-def detectar_linha_onibus(img):
+def consolidar_leituras(leituras, trilha=None, repetidas=False):
+    """
+    Decide a linha de um letreiro a partir das leituras do OCR
+    
+    Sem trilha: primeira leitura com confiança > 0.4 (frame isolado).
+    Com trilha: as leituras viram votos acumulados entre frames e a linha
+    só é confirmada quando passa de LIMIAR_VOTOS_OCR. Leituras repetidas
+    (cache de OCR) não votam de novo numa trilha que já votou, só gastam uma
+    tentativa.
+    
+    Returns:
+        str ou None: linha confirmada
+    """
+    if trilha is None:
+        return next((linha for linha, conf in leituras if conf > 0.4), None)
+    
+    linha = trilha.votar(leituras, rastreador.limiar_votos, repetidas=repetidas)
+    if linha is None and trilha.votos:
+        print(f"🗳️  Trilha {trilha.id}: votos {trilha.votos}")
+    return linha
+
+
+def detectar_linha_onibus(img, camera_id=None):
     """
     1. YOLO detecta ônibus na imagem
     2. Recorta região do letreiro (parte superior)
-    3. EasyOCR lê o número
+    3. Lê o número por templates de dígitos; EasyOCR só se a leitura for
+       incerta (ou reaproveita a leitura de um letreiro igual)
     4. Valida se é linha conhecida
     
+    Com camera_id, o ônibus é acompanhado entre frames e as leituras do OCR
+    são votadas até a linha da trilha ser confirmada; depois disso o OCR
+    não roda mais para esse ônibus.
+    
     Returns:
         str ou None: Número da linha detectada
     """
+    return detectar_linhas_onibus([img], [camera_id])[0]
+
+
+def detectar_linhas_onibus(imgs, cameras=None):
+    """
+    Versão em lote de detectar_linha_onibus
+    
+    1. Uma única chamada do YOLO para todas as imagens
+    2. Cada ônibus é associado à sua trilha na câmera (se houver camera_id);
+       trilhas com linha confirmada não passam de novo pelo OCR
+    3. Os letreiros restantes passam pelo leitor de dígitos; os que ele não
+       lê com confiança vão para uma única passada do EasyOCR
+    4. As leituras de cada letreiro votam na linha da trilha
+    
+    Args:
+        imgs: lista de imagens numpy array (BGR)
+        cameras: camera_id de cada imagem (None = sem rastreamento)
+    
+    Returns:
+        list: Número da linha (ou None) de cada imagem, na mesma ordem
+    """
+    linhas = [None] * len(imgs)
+    cameras = cameras or [None] * len(imgs)
+    
+    if not imgs:
+        return linhas
+    
     if not OCR_AVAILABLE:
         print("⚠️  OCR não disponível")
-        return None
+        return linhas
     
     try:
-        # Detectar objetos com YOLO
-        results = model(img, conf=0.5)[0]  # Confiança mínima 50%
+        # YOLO em lote, só na ROI de cada câmera (o letreiro é recortado da ROI)
+        imgs = [perfil_deteccao.recortar_roi(img, c) for img, c in zip(imgs, cameras)]
+        resultados = model(imgs, **perfil_deteccao.kwargs_yolo())
         
-        for det in results.boxes:
-            cls_id = int(det.cls[0])
-            class_name = model.names[cls_id]
+        # Recortar letreiros que ainda precisam de OCR, lembrando a imagem
+        # de origem e a trilha (letreiros já lidos saem do cache, sem OCR)
+        indices = []
+        chaves = []
+        trilhas_ocr = []
+        letreiros = []
+        for i, (img, results, camera_id) in enumerate(zip(imgs, resultados, cameras)):
+            caixas = [
+                tuple(map(int, det.xyxy[0]))
+                for det in results.boxes
+                if model.names[int(det.cls[0])] == "bus"
+            ]
             
-            # Se detectou ônibus (class 5 no COCO é "bus")
-            if class_name == "bus":
-                confidence = float(det.conf[0])
-                print(f"🚌 Ônibus detectado (confiança: {confidence:.2f})")
-                
-                # Pegar coordenadas da bounding box
-                x1, y1, x2, y2 = map(int, det.xyxy[0])
-                
-                # Recortar região do ônibus
-                onibus_crop = img[y1:y2, x1:x2]
+            if camera_id is not None:
+                trilhas = rastreador.atualizar(camera_id, caixas)
+            else:
+                trilhas = [None] * len(caixas)
+            
+            for caixa, trilha in zip(caixas, trilhas):
+                if trilha is not None:
+                    if trilha.linha:
+                        # Ônibus já identificado em frame anterior
+                        print(f"🚌 Trilha {trilha.id}: linha {trilha.linha} (OCR evitado)")
+                        if linhas[i] is None:
+                            linhas[i] = trilha.linha
+                        continue
+                    
+                    if not trilha.precisa_ocr(rastreador.max_tentativas_ocr):
+                        continue
                 
-                if onibus_crop.size == 0:
+                letreiro_crop = recortar_letreiro(img, caixa)
+                if letreiro_crop is None:
                     continue
                 
-                # Focar na parte superior do ônibus (letreiro)
-                altura = onibus_crop.shape[0]
-                letreiro_crop = onibus_crop[0:int(altura*0.35), :]
-                
-                # Pré-processamento para melhorar OCR
-                gray = cv2.cvtColor(letreiro_crop, cv2.COLOR_BGR2GRAY)
-                
-                # Aumentar contraste
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                enhanced = clahe.apply(gray)
-                
-                # Threshold adaptativo
-                thresh = cv2.adaptiveThreshold(
-                    enhanced, 255, 
-                    cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                    cv2.THRESH_BINARY, 
-                    11, 2
-                )
+                # Letreiro igual já lido nesta câmera: reaproveita as leituras
+                chave = hash_letreiro(letreiro_crop)
+                encontrado, leituras = cache_ocr.obter(chave, camera_id)
+                if encontrado:
+                    linha = consolidar_leituras(leituras, trilha, repetidas=True)
+                    if linhas[i] is None:
+                        linhas[i] = linha
+                    continue
                 
-                # OCR
-                print("🔍 Executando OCR...")
-                ocr_results = reader.readtext(thresh)
+                # Leitor de dígitos; EasyOCR só se a leitura for incerta
+                if reconhecedor_digitos is not None:
+                    leituras = reconhecedor_digitos.ler(letreiro_crop)
+                    if leituras:
+                        cache_ocr.guardar(chave, leituras, camera_id)
+                        linha = consolidar_leituras(leituras, trilha)
+                        if linhas[i] is None:
+                            linhas[i] = linha
+                        continue
                 
-                # Procurar linhas válidas no texto detectado
-                for (bbox, text, conf_ocr) in ocr_results:
-                    # Extrair apenas números do texto
-                    numeros = ''.join(filter(str.isdigit, text))
-                    
-                    print(f"   OCR leu: '{text}' → '{numeros}' (conf: {conf_ocr:.2f})")
-                    
-                    # Verificar se é uma linha conhecida
-                    if numeros in LINHAS_CONHECIDAS and conf_ocr > 0.4:
-                        print(f"✅ LINHA {numeros} IDENTIFICADA!")
-                        return numeros
+                indices.append(i)
+                chaves.append(chave)
+                trilhas_ocr.append(trilha)
+                letreiros.append(preprocessar_letreiro(letreiro_crop))
         
-        print("ℹ️  Nenhuma linha válida detectada")
-        return None
+        if not letreiros:
+            print(f"ℹ️  Nenhum letreiro novo para OCR no lote ({len(imgs)} imagens)")
+            return linhas
+        
+        # OCR em lote
+        print(f"🔍 Executando OCR em lote ({len(letreiros)} letreiros)...")
+        ocr_lote = reader.readtext_batched(empilhar_letreiros(letreiros))
+        
+        # Leituras de cada letreiro votam na linha da trilha
+        for i, chave, trilha, ocr_results in zip(indices, chaves, trilhas_ocr, ocr_lote):
+            leituras = leituras_validas(ocr_results, LINHAS_CONHECIDAS)
+            cache_ocr.guardar(chave, leituras, cameras[i])
+            
+            linha = consolidar_leituras(leituras, trilha)
+            if linhas[i] is None:
+                linhas[i] = linha
+        
+        return linhas
         
     except Exception as e:
-        print(f"❌ Erro na detecção: {e}")
-        salvar_log("erro", "Erro na detecção YOLO+OCR", {"erro": str(e)})
-        return None
+        print(f"❌ Erro na detecção em lote: {e}")
+        salvar_log("erro", "Erro na detecção YOLO+OCR em lote", {"erro": str(e)})
+        return [None] * len(imgs)
+
+
+# ================================================
+# AGENDADOR DE INFERÊNCIA
+# ================================================
+# Todos os frames de /upload passam por aqui e a fila limitada gera
+# HTTP 429 sob carga. Dois modos, com a mesma interface submit(img, camera_id):
+# - DETECTOR_WORKERS=0: o modelo do processo web roda em micro-lotes
+#   numa única thread
+# - DETECTOR_WORKERS=N: N processos, cada um com seu YOLO + EasyOCR,
+#   lendo os frames direto de um anel de memória compartilhada
+#   (criado lá em cima, antes de qualquer thread)
+if pool_deteccao is not None:
+    fila_inferencia = pool_deteccao
+else:
+    fila_inferencia = InferenceScheduler(
+        detectar_linhas_onibus,
+        max_lote=INFERENCIA_MAX_LOTE,
+        max_espera_ms=INFERENCIA_MAX_ESPERA_MS,
+        max_fila=INFERENCIA_MAX_FILA
+    )
+
+
+def modelos_prontos():
+    """True quando os modelos (do processo web ou de um worker) estão aquecidos"""
+    if DETECTOR_WORKERS > 0:
+        return fila_inferencia.pronto()
+    return carregador_modelos.pronto()
+
+
+def resposta_aquecendo():
+    """Resposta HTTP 503 com Retry-After enquanto os modelos carregam"""
+    resposta = jsonify({
+        "status": "warming",
+        "error": "Modelos carregando, tente novamente",
+        "retry_after_s": RETRY_AFTER_S
+    })
+    resposta.status_code = 503
+    resposta.headers["Retry-After"] = str(RETRY_AFTER_S)
+    return resposta
+
+
+def resultado_deteccao(linha_detectada, camera_id):
+    """
+    Corpo e status HTTP do resultado de um frame (upload síncrono ou job)
+    
+    Returns:
+        tuple: (dict, int)
+    """
+    if linha_detectada:
+        print(f"🎉 Linha {linha_detectada} detectada com sucesso!")
+        
+        # Mesmo ônibus ainda na frente da câmera: não é detecção nova
+        nova = DETECTOR_WORKERS > 0 or rastreador.reportar(camera_id, linha_detectada)
+        
+        return {
+            "status": "success",
+            "linha_detectada": linha_detectada,
+            "nome_linha": LINHAS_CONHECIDAS[linha_detectada]["nome"],
+            "nova_deteccao": nova,
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }, 201
+    
+    print("ℹ️  Nenhum ônibus válido detectado")
+    
+    return {
+        "status": "not_found",
+        "linha_detectada": "nenhum",
+        "mensagem": "Nenhum ônibus válido detectado"
+    }, 200
+
+
+# Jobs do upload assíncrono (resultado consultado depois)
+jobs = RegistroJobs(max_jobs=JOBS_MAX, ttl_s=JOBS_TTL_S)
+
+
+def concluir_job(job_id, camera_id, future):
+    """Callback do Future: guarda o resultado do frame no job"""
+    try:
+        corpo, codigo = resultado_deteccao(future.result(), camera_id)
+        jobs.concluir(job_id, corpo, codigo)
+    except Exception as e:
+        print(f"❌ Erro no job {job_id}: {e}")
+        jobs.concluir(job_id, {"error": str(e)}, 500, erro=True)
+
+
+# Expiração das detecções fora do caminho da requisição (o insert não
+# faz mais limpeza); os índices são criados na primeira execução, logo
+# que o servidor sobe
+tarefa_expirar = TarefaPeriodica(
+    "expirar-deteccoes",
+    EXPIRAR_INTERVALO_S,
+    expirar_deteccoes,
+    preparar=garantir_indices
+).iniciar()
+
+
+def acompanhar_mudancas():
+    """
+    Aplica no quadro de chegadas as detecções inseridas/alteradas por
+    qualquer processo (change stream). Sai se o MongoDB não oferece change
+    streams (servidor standalone); com erro de rede, tenta de novo.
+    """
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    tentativas = 0
+    
+    while True:
+        try:
+            with deteccoes_collection.watch(pipeline, full_document="updateLookup") as mudancas:
+                print("📡 Change stream das detecções ativo")
+                tentativas = 0
+                for mudanca in mudancas:
+                    det = mudanca.get("fullDocument")
+                    if not det or "previsao_chegada" not in det:
+                        continue
+                    if det["status"] == "em_rota":
+                        quadro_chegadas.adicionar(det["parada_destino"], det)
+                    else:
+                        quadro_chegadas.remover(det["parada_destino"], det["deteccao_id"])
+        except OperationFailure as e:
+            print(f"ℹ️  Change stream indisponível ({e}); quadro atualizado só por este processo")
+            return
+        except PyMongoError as e:
+            tentativas += 1
+            print(f"⚠️  Change stream interrompido: {e}")
+            time.sleep(min(2 ** tentativas, 60))
+
+
+if QUADRO_CHANGE_STREAM:
+    threading.Thread(target=acompanhar_mudancas, name="change-stream-deteccoes", daemon=True).start()
+
+# Contadores do /stats: primeira contagem logo ao subir, depois só correção
+tarefa_contadores = TarefaPeriodica(
+    "reconciliar-contadores",
+    ESTATISTICAS_RECONCILIAR_S,
+    reconciliar_contadores
+).iniciar()
+
+# Rollup: upserts $inc em lote; o que sobrou na memória é gravado na saída
+tarefa_rollup = TarefaPeriodica(
+    "rollup-deteccoes",
+    ROLLUP_INTERVALO_S,
+    agregador_deteccoes.gravar,
+    preparar=agregador_deteccoes.garantir_indices,
+    executar_ao_iniciar=False
+).iniciar()
+atexit.register(tarefa_rollup.executar)
+
+# Médias do tempo de viagem: carregadas ao subir, salvas periodicamente
+tarefa_tempos_viagem = TarefaPeriodica(
+    "tempos-viagem",
+    TEMPO_VIAGEM_SALVAR_S,
+    salvar_tempos_viagem,
+    preparar=carregar_tempos_viagem,
+    executar_ao_iniciar=False
+).iniciar()
+atexit.register(tarefa_tempos_viagem.executar)
+
+
+def encerrar_por_sinal(signum, frame):
+    """SIGTERM vira uma saída normal (roda os atexit acima e os dos escritores)"""
+    print(f"⏹️  Sinal {signum} recebido, gravando o que está em memória...")
+    sys.exit(0)
+
+
+# SIGTERM (deploy, docker stop) derruba o processo sem atexit: detecções e
+# logs na fila, rollup e tempos de viagem em memória seriam perdidos. Só no
+# processo principal e se ninguém instalou handler antes (o gunicorn tem o
+# dele, que já encerra o worker normalmente)
+if (threading.current_thread() is threading.main_thread()
+        and signal.getsignal(signal.SIGTERM) == signal.SIG_DFL):
+    signal.signal(signal.SIGTERM, encerrar_por_sinal)
+
+# Câmeras lidas direto pelo servidor (MJPEG/RTSP)
+streams = GerenciadorStreams(max_streams=STREAMS_MAX)
+
+
+def aceitar_frame_stream(camera_id, img):
+    """Frame do stream segue para a detecção? (modelos prontos e cena mudou)"""
+    if not modelos_prontos():
+        return False
+    return filtro_movimento is None or filtro_movimento.mudou(camera_id, img)
+
+
+def frame_enviado_stream(camera_id, img):
+    """Frame do stream entrou na fila: vira a referência do filtro de movimento"""
+    if filtro_movimento is not None:
+        filtro_movimento.confirmar(camera_id, img)
+
+
+def registrar_deteccao_stream(ingestor, linha):
+    """Linha nova vista num stream: entra na fila da parada de destino"""
+    # Mesmo ônibus ainda na frente da câmera: não é detecção nova
+    if DETECTOR_WORKERS == 0 and not rastreador.reportar(ingestor.camera_id, linha):
+        return
+    
+    print(f"🎉 Stream {ingestor.id}: linha {linha} detectada")
+    registrar_deteccao(
+        linha,
+        ingestor.dados["parada_origem"],
+        ingestor.dados["parada_destino"],
+        fonte="stream"
+    )
+
+
+def resposta_fila_cheia():
+    """Resposta HTTP 429 com Retry-After quando a fila de inferência está cheia"""
+    resposta = jsonify({
+        "error": "Servidor ocupado, tente novamente",
+        "retry_after_s": RETRY_AFTER_S
+    })
+    resposta.status_code = 429
+    resposta.headers["Retry-After"] = str(RETRY_AFTER_S)
+    return resposta
 
 
 # ================================================
@@ -217,9 +1014,18 @@ def home():
         "version": "1.0",
         "endpoints": {
             "GET /health": "Status do servidor",
-            "POST /upload": "Upload de imagem para detecção",
+            "POST /upload": "Upload de imagem para detecção (?async=1 devolve job_id)",
+            "GET /jobs/<id>": "Resultado de um upload assíncrono",
+            "GET /jobs/<id>/stream": "Resultado de um upload assíncrono (SSE)",
+            "POST /streams": "Ler uma câmera MJPEG/RTSP direto no servidor",
+            "GET /streams": "Listar streams ativos",
+            "DELETE /streams/<id>": "Encerrar um stream",
+            "POST /upload/batch": "Upload de várias imagens (detecção em lote)",
             "POST /deteccao/manual": "Registrar detecção manual",
+            "POST /deteccao/<id>/chegada": "Registrar chegada (aprende o tempo de viagem)",
             "GET /previsoes/<parada>": "Consultar previsões",
+            "GET /previsoes/<parada>/stream": "Quadro de chegadas (SSE)",
+            "GET /analytics/<granularidade>": "Detecções agregadas por minuto/hora/dia",
             "GET /linhas": "Listar linhas conhecidas",
             "GET /stats": "Estatísticas do sistema"
         }
@@ -228,11 +1034,26 @@ def home():
 
 @app.route("/health", methods=["GET"])
 def health():
-    """Health check"""
+    """Health check (responde 200 mesmo aquecendo, para o deploy não falhar)"""
+    if DETECTOR_WORKERS > 0:
+        modelos = fila_inferencia.to_dict()
+    else:
+        modelos = carregador_modelos.to_dict()
+    
+    if modelos_prontos():
+        status = "online"
+    else:
+        status = "error" if modelos["estado"] == "erro" else "warming"
+    
     return jsonify({
-        "status": "online",
+        "status": status,
         "service": "BRT Detection Server",
         "yolo": "active",
+        "modelos": modelos,
+        "yolo_backend": YOLO_BACKEND,
+        "perfil_deteccao": perfil_deteccao.to_dict(),
+        "detector_workers": DETECTOR_WORKERS,
+        "fila_inferencia": fila_inferencia.tamanho_fila(),
         "ocr": "active" if OCR_AVAILABLE else "inactive",
         "mongodb": "connected",
         "timestamp": datetime.now(timezone.utc).isoformat()
@@ -248,16 +1069,27 @@ def upload_image():
         imagem: arquivo de imagem
         parada_origem: string (default "A")
         parada_destino: string (default "B")
+        camera_id: string (default = parada_origem)
+    
+    Query:
+        async=1: responde 202 com job_id na hora; o resultado sai em
+            GET /jobs/<id> ou GET /jobs/<id>/stream
     """
     try:
         if "imagem" not in request.files:
             return jsonify({"error": "Imagem não enviada"}), 400
         
+        if not modelos_prontos():
+            return resposta_aquecendo()
+        
         file = request.files["imagem"]
         parada_origem = request.form.get("parada_origem", "A")
         parada_destino = request.form.get("parada_destino", "B")
+        camera_id = request.form.get("camera_id", parada_origem)
+        assincrono = request.args.get("async", "0").lower() in ("1", "true", "sim")
         
-        # Ler imagem
+        # Ler imagem (frombuffer não copia; no modo pool o frame decodificado
+        # é copiado uma única vez, para o slot do anel de memória compartilhada)
         img_bytes = file.read()
         npimg = np.frombuffer(img_bytes, np.uint8)
         img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
@@ -269,33 +1101,277 @@ def upload_image():
         print(f"📸 Nova imagem recebida ({len(img_bytes)} bytes)")
         print(f"{'='*70}")
         
-        # Detectar linha com YOLO + OCR
-        linha_detectada = detectar_linha_onibus(img)
-        
-        if linha_detectada:
-            print(f"🎉 Linha {linha_detectada} detectada com sucesso!")
+        # Cena parada: nada novo para detectar
+        if filtro_movimento and not filtro_movimento.mudou(camera_id, img):
+            print(f"⏸️  Cena sem mudança na câmera {camera_id}, YOLO ignorado")
             
             return jsonify({
-                "status": "success",
-                "linha_detectada": linha_detectada,
-                "nome_linha": LINHAS_CONHECIDAS[linha_detectada]["nome"],
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }), 201
-        else:
-            print("ℹ️  Nenhum ônibus válido detectado")
-            
-            return jsonify({
-                "status": "not_found",
+                "status": "not_changed",
                 "linha_detectada": "nenhum",
-                "mensagem": "Nenhum ônibus válido detectado"
+                "mensagem": "Cena sem mudança desde o último frame processado"
             }), 200
         
+        # Detectar linha com YOLO + OCR (no próximo micro-lote)
+        try:
+            future = fila_inferencia.submit(img, camera_id)
+        except FilaCheiaError:
+            print("⚠️  Fila de inferência cheia")
+            return resposta_fila_cheia()
+        
+        # Só um frame aceito vira referência (429 não pode esconder a cena nova)
+        if filtro_movimento:
+            filtro_movimento.confirmar(camera_id, img)
+        
+        # Assíncrono: a conexão é liberada e o resultado vai para o job
+        if assincrono:
+            job = jobs.criar()
+            future.add_done_callback(lambda f: concluir_job(job.id, camera_id, f))
+            print(f"📨 Job {job.id} criado")
+            
+            return jsonify({
+                "status": "accepted",
+                "job_id": job.id,
+                "resultado_url": f"/jobs/{job.id}",
+                "stream_url": f"/jobs/{job.id}/stream"
+            }), 202
+        
+        linha_detectada = future.result(timeout=INFERENCIA_TIMEOUT_S)
+        
+        corpo, codigo = resultado_deteccao(linha_detectada, camera_id)
+        return jsonify(corpo), codigo
+        
+    except InferenciaTimeoutError:
+        print("❌ Timeout na inferência")
+        return jsonify({"error": "Timeout na detecção"}), 504
+        
     except Exception as e:
         print(f"❌ Erro no upload: {e}")
         salvar_log("erro", "Erro no endpoint /upload", {"erro": str(e)})
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """
+    Resultado de um upload assíncrono (polling)
+    
+    Query:
+        espera: segundos para aguardar o job terminar (long polling, opcional)
+    
+    Exemplo: GET /jobs/3f2a...?espera=10
+    """
+    job = jobs.obter(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado ou expirado"}), 404
+    
+    try:
+        espera = min(float(request.args.get("espera", 0)), INFERENCIA_TIMEOUT_S)
+    except ValueError:
+        return jsonify({"error": "espera inválida"}), 400
+    
+    if espera > 0:
+        job.aguardar(espera)
+    
+    return jsonify(job.to_dict()), 200
+
+
+@app.route("/jobs/<job_id>/stream", methods=["GET"])
+def stream_job(job_id):
+    """
+    Resultado de um upload assíncrono via Server-Sent Events
+    
+    Envia comentários de keep-alive enquanto o job está pendente e um
+    evento "resultado" quando ele termina (ou "timeout"), fechando o stream.
+    """
+    job = jobs.obter(job_id)
+    if job is None:
+        return jsonify({"error": "Job não encontrado ou expirado"}), 404
+    
+    def eventos():
+        limite = time.monotonic() + INFERENCIA_TIMEOUT_S
+        while not job.aguardar(SSE_KEEPALIVE_S):
+            if time.monotonic() >= limite:
+                yield f"event: timeout\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            yield ": aguardando\n\n"
+        
+        yield f"event: resultado\ndata: {json.dumps(job.to_dict())}\n\n"
+    
+    return Response(
+        eventos(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/streams", methods=["POST"])
+def criar_stream():
+    """
+    Abre uma câmera MJPEG/RTSP e envia frames amostrados para a detecção
+    
+    JSON Body:
+    {
+        "url": "rtsp://10.0.0.5:554/stream1",
+        "camera_id": "camera_A",      (default = parada_origem)
+        "parada_origem": "A",
+        "parada_destino": "B",
+        "fps": 1.0                    (default STREAM_FPS)
+    }
+    
+    Só URLs rtsp(s)/http(s) são aceitas (nada de arquivo local ou índice de
+    câmera), e só dos hosts em STREAMS_HOSTS_PERMITIDOS.
+    
+    Linhas novas entram direto na fila da parada de destino (como em
+    /deteccao/manual); frames que chegam com o detector ocupado são descartados.
+    """
+    try:
+        data = request.get_json() or {}
+        
+        url = data.get("url")
+        if not url:
+            return jsonify({"error": "URL do stream não informada"}), 400
+        
+        try:
+            validar_url_stream(str(url), STREAMS_HOSTS_PERMITIDOS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        parada_origem = data.get("parada_origem", "A")
+        parada_destino = data.get("parada_destino", "B")
+        
+        try:
+            fps = float(data.get("fps", STREAM_FPS))
+        except (TypeError, ValueError):
+            return jsonify({"error": "fps inválido"}), 400
+        
+        ingestor = streams.adicionar(
+            url=str(url),
+            camera_id=data.get("camera_id", parada_origem),
+            fila=fila_inferencia,
+            ao_detectar=registrar_deteccao_stream,
+            fps=fps,
+            aceitar_frame=aceitar_frame_stream,
+            frame_enviado=frame_enviado_stream,
+            janela_repeticao_s=STREAM_JANELA_REPETICAO_S,
+            dados={"parada_origem": parada_origem, "parada_destino": parada_destino}
+        )
+        
+        if ingestor is None:
+            return jsonify({"error": f"Máximo de {STREAMS_MAX} streams ativos"}), 429
+        
+        print(f"📹 Stream {ingestor.id} criado ({mascarar_url(ingestor.url)})")
+        return jsonify(ingestor.to_dict()), 201
+        
+    except Exception as e:
+        print(f"❌ Erro ao criar stream: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/streams", methods=["GET"])
+def listar_streams():
+    """Streams ativos com contadores de frames enviados/descartados"""
+    lista = streams.listar()
+    return jsonify({"total": len(lista), "streams": lista})
+
+
+@app.route("/streams/<stream_id>", methods=["DELETE"])
+def remover_stream(stream_id):
+    """Encerra a leitura de um stream"""
+    if not streams.remover(stream_id):
+        return jsonify({"error": "Stream não encontrado"}), 404
+    return jsonify({"status": "removed", "stream_id": stream_id})
+
+
+@app.route("/upload/batch", methods=["POST"])
+def upload_batch():
+    """
+    Recebe uma rajada de imagens da câmera e detecta tudo em lote
+    (uma chamada do YOLO e uma passada do OCR para todas as imagens)
+    
+    Form Data:
+        imagens: arquivos de imagem (campo repetido, até MAX_IMAGENS_LOTE)
+        parada_origem: string (default "A")
+        parada_destino: string (default "B")
+        camera_id: string (default = parada_origem)
+    """
+    try:
+        arquivos = request.files.getlist("imagens")
+        camera_id = request.form.get("camera_id", request.form.get("parada_origem", "A"))
+        
+        if not arquivos:
+            return jsonify({"error": "Nenhuma imagem enviada"}), 400
+        
+        if len(arquivos) > MAX_IMAGENS_LOTE:
+            return jsonify({
+                "error": f"Máximo de {MAX_IMAGENS_LOTE} imagens por lote"
+            }), 400
+        
+        if not modelos_prontos():
+            return resposta_aquecendo()
+        
+        # Decodificar imagens (inválidas ficam fora do lote)
+        imgs = []
+        indices_validos = []
+        resultados = []
+        for i, file in enumerate(arquivos):
+            npimg = np.frombuffer(file.read(), np.uint8)
+            img = cv2.imdecode(npimg, cv2.IMREAD_COLOR)
+            
+            if img is None:
+                resultados.append({"indice": i, "status": "error", "error": "Imagem inválida"})
+            else:
+                imgs.append(img)
+                indices_validos.append(i)
+                resultados.append(None)
+        
+        print(f"\n{'='*70}")
+        print(f"📸 Lote recebido ({len(arquivos)} imagens, {len(imgs)} válidas)")
+        print(f"{'='*70}")
+        
+        # Detectar linhas com YOLO + OCR (o agendador junta tudo em micro-lotes).
+        # Todos ou nenhum: com 429 nada fica rodando, e o cliente pode
+        # reenviar o lote sem inferir (nem rastrear) frames duas vezes
+        try:
+            futures = fila_inferencia.submit_lote(imgs, camera_id)
+        except FilaCheiaError:
+            print("⚠️  Fila de inferência cheia")
+            return resposta_fila_cheia()
+        
+        linhas = [f.result(timeout=INFERENCIA_TIMEOUT_S) for f in futures]
+        
+        agora = datetime.now(timezone.utc).isoformat()
+        for i, linha in zip(indices_validos, linhas):
+            if linha:
+                resultados[i] = {
+                    "indice": i,
+                    "status": "success",
+                    "linha_detectada": linha,
+                    "nome_linha": LINHAS_CONHECIDAS[linha]["nome"],
+                    "timestamp": agora
+                }
+            else:
+                resultados[i] = {
+                    "indice": i,
+                    "status": "not_found",
+                    "linha_detectada": "nenhum"
+                }
+        
+        return jsonify({
+            "total": len(arquivos),
+            "detectadas": sum(1 for l in linhas if l),
+            "resultados": resultados
+        }), 200
+        
+    except InferenciaTimeoutError:
+        print("❌ Timeout na inferência em lote")
+        return jsonify({"error": "Timeout na detecção"}), 504
+        
+    except Exception as e:
+        print(f"❌ Erro no upload em lote: {e}")
+        salvar_log("erro", "Erro no endpoint /upload/batch", {"erro": str(e)})
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/deteccao/manual", methods=["POST"])
 def deteccao_manual():
     """
@@ -324,60 +1400,42 @@ def deteccao_manual():
                 "linhas_validas": list(LINHAS_CONHECIDAS.keys())
             }), 404
         
-        # Limpar detecções antigas
-        limpar_deteccoes_antigas()
-        
-        # Gerar ID único
-        deteccao_id = gerar_id_deteccao()
-        
-        # Calcular previsão
-        linha_info = LINHAS_CONHECIDAS[linha]
-        tempo_min = linha_info["tempo_medio_min"]
-        
-        agora = datetime.now(timezone.utc)
-        previsao_chegada = agora + timedelta(minutes=tempo_min)
-        
-        # Salvar detecção
-        deteccao = {
-            "deteccao_id": deteccao_id,
-            "linha": linha,
-            "nome_linha": linha_info["nome"],
-            "parada_origem": parada_origem,
-            "parada_destino": parada_destino,
-            "hora_deteccao": agora.isoformat(),
-            "previsao_chegada": previsao_chegada.isoformat(),
-            "tempo_estimado_min": tempo_min,
-            "distancia_km": linha_info["distancia_km"],
-            "status": "em_rota",
-            "fonte": "deteccao_automatica"
-        }
-        
-        result = deteccoes_collection.insert_one(deteccao)
-        
-        # Contar posição na fila
-        posicao = deteccoes_collection.count_documents({
-            "parada_destino": parada_destino,
-            "status": "em_rota",
-            "hora_deteccao": {"$lte": agora.isoformat()}
-        })
-        
-        print(f"✅ Detecção registrada: Linha {linha} (posição {posicao})")
+        try:
+            return jsonify(registrar_deteccao(linha, parada_origem, parada_destino)), 201
+        except FilaCheiaError:
+            print("⚠️  Fila de escrita cheia")
+            return resposta_fila_cheia()
         
-        salvar_log("deteccao", f"Ônibus {linha} detectado", {"deteccao_id": deteccao_id})
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/deteccao/<deteccao_id>/chegada", methods=["POST"])
+def deteccao_chegada(deteccao_id):
+    """
+    Registra que o ônibus de uma detecção chegou à parada de destino
+    
+    O tempo entre a detecção e a chegada atualiza a estimativa do trecho
+    usada nas próximas previsões.
+    
+    Exemplo: POST /deteccao/3f2a9c1b/chegada
+    """
+    try:
+        resultado = registrar_chegada(deteccao_id)
+        if resultado is None:
+            return jsonify({"error": "Detecção não encontrada ou já chegou"}), 404
+        return jsonify(resultado), 200
         
-        return jsonify({
-            "status": "success",
-            "deteccao_id": deteccao_id,
-            "linha": linha,
-            "nome_linha": linha_info["nome"],
-            "tempo_estimado_min": tempo_min,
-            "previsao_chegada": previsao_chegada.isoformat(),
-            "posicao_fila": posicao,
-            "mongodb_id": str(result.inserted_id)
-        }), 201
+    except TimeoutError as e:
+        print(f"⚠️  Chegada de {deteccao_id} adiada: {e}")
+        resposta = jsonify({"error": str(e), "retry_after_s": RETRY_AFTER_S})
+        resposta.status_code = 503
+        resposta.headers["Retry-After"] = str(RETRY_AFTER_S)
+        return resposta
         
     except Exception as e:
-        print(f"❌ Erro: {e}")
+        print(f"❌ Erro ao registrar chegada: {e}")
         return jsonify({"error": str(e)}), 500
 
 
@@ -390,46 +1448,42 @@ def get_previsoes(parada_id):
     Exemplo: GET /previsoes/B
     """
     try:
-        agora = datetime.now(timezone.utc)
-        
-        # Buscar detecções ativas
-        deteccoes = deteccoes_collection.find({
-            "parada_destino": parada_id,
-            "status": "em_rota"
-        }).sort("previsao_chegada", 1)
+        return jsonify(montar_previsoes(parada_id))
         
-        previsoes = []
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/previsoes/<parada_id>/stream", methods=["GET"])
+def stream_previsoes(parada_id):
+    """
+    Quadro de chegadas da parada via Server-Sent Events
+    
+    Envia um evento "quadro" (mesmo corpo do GET /previsoes/<parada>) ao
+    conectar e sempre que o quadro muda: detecção nova, detecção que saiu
+    ou minutos que viraram. Entre mudanças, só comentários de keep-alive.
+    """
+    def eventos():
+        enviado = None
         
-        for det in deteccoes:
-            previsao_dt = datetime.fromisoformat(det["previsao_chegada"])
-            minutos_restantes = int((previsao_dt - agora).total_seconds() / 60)
+        while True:
+            versao = quadro_chegadas.versao(parada_id)
+            corpo = montar_previsoes(parada_id)
             
-            # Incluir até 1 minuto atrasado
-            if minutos_restantes >= -1:
-                previsoes.append({
-                    "deteccao_id": det["deteccao_id"],
-                    "linha": det["linha"],
-                    "nome": det["nome_linha"],
-                    "minutos": max(0, minutos_restantes),
-                    "previsao_hora": previsao_dt.strftime("%H:%M"),
-                    "status": "chegando" if minutos_restantes <= 0 else "em_rota"
-                })
+            if corpo["previsoes"] != enviado:
+                enviado = corpo["previsoes"]
+                yield f"event: quadro\ndata: {json.dumps(corpo)}\n\n"
             else:
-                # Marcar como expirado
-                deteccoes_collection.update_one(
-                    {"_id": det["_id"]},
-                    {"$set": {"status": "expirado"}}
-                )
-        
-        return jsonify({
-            "parada": parada_id,
-            "total": len(previsoes),
-            "previsoes": previsoes[:10],  # Máximo 10
-            "atualizado_em": agora.strftime("%H:%M:%S")
-        })
-        
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+                yield ": sem mudancas\n\n"
+            
+            # Acorda na próxima mudança ou no keep-alive (minutos, vencidas)
+            quadro_chegadas.aguardar_mudanca(parada_id, versao, SSE_KEEPALIVE_S)
+    
+    return Response(
+        eventos(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.route("/linhas", methods=["GET"])
@@ -450,29 +1504,100 @@ def listar_linhas():
     })
 
 
+@app.route("/analytics/<granularidade>", methods=["GET"])
+def analytics(granularidade):
+    """
+    Detecções agregadas por minuto, hora ou dia (baldes do rollup)
+    
+    Query params:
+        desde, ate: período em ISO 8601 (padrão: última hora para "minuto",
+            últimas 24h para "hora", últimos 30 dias para "dia")
+        linha: só uma linha
+        parada: parada de origem ou destino
+    
+    Exemplo: GET /analytics/hora?linha=437&desde=2025-12-03T00:00:00Z
+    """
+    if granularidade not in GRANULARIDADES:
+        return jsonify({
+            "error": "Granularidade inválida",
+            "granularidades": list(GRANULARIDADES)
+        }), 400
+    
+    janelas = {"minuto": timedelta(hours=1), "hora": timedelta(days=1), "dia": timedelta(days=30)}
+    
+    try:
+        ate = request.args.get("ate")
+        ate = datetime.fromisoformat(ate) if ate else datetime.now(timezone.utc)
+        desde = request.args.get("desde")
+        desde = datetime.fromisoformat(desde) if desde else ate - janelas[granularidade]
+    except ValueError:
+        return jsonify({"error": "Datas devem estar em ISO 8601"}), 400
+    
+    # Sem fuso = UTC (como as datas gravadas)
+    desde = desde if desde.tzinfo else desde.replace(tzinfo=timezone.utc)
+    ate = ate if ate.tzinfo else ate.replace(tzinfo=timezone.utc)
+    
+    try:
+        baldes = consultar_baldes(
+            rollup_collection,
+            granularidade,
+            desde,
+            ate,
+            linha=request.args.get("linha"),
+            parada=request.args.get("parada")
+        )
+        
+        return jsonify({
+            "granularidade": granularidade,
+            "desde": desde.isoformat(),
+            "ate": ate.isoformat(),
+            "total": len(baldes),
+            "baldes": baldes
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route("/stats", methods=["GET"])
 def estatisticas():
-    """Estatísticas do sistema"""
+    """
+    Estatísticas do sistema
+    
+    Os totais vêm dos contadores em memória (sem varrer a collection);
+    "contadores" mostra quando foram reconciliados com o banco.
+    """
     try:
-        total = deteccoes_collection.count_documents({})
-        em_rota = deteccoes_collection.count_documents({"status": "em_rota"})
-        chegaram = deteccoes_collection.count_documents({"status": "chegou"})
-        
-        # Top linhas
-        pipeline = [
-            {"$group": {"_id": "$linha", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}},
-            {"$limit": 5}
-        ]
-        top_linhas = list(deteccoes_collection.aggregate(pipeline))
+        resumo = contadores_deteccoes.resumo()
+        por_status = resumo["por_status"]
         
         return jsonify({
-            "total_deteccoes": total,
-            "em_rota": em_rota,
-            "chegaram": chegaram,
-            "expirados": total - em_rota - chegaram,
-            "top_linhas": top_linhas,
-            "linhas_cadastradas": len(LINHAS_CONHECIDAS)
+            "total_deteccoes": resumo["total"],
+            "em_rota": por_status.get("em_rota", 0),
+            "chegaram": por_status.get("chegou", 0),
+            "expirados": por_status.get("expirado", 0),
+            "top_linhas": resumo["top_linhas"],
+            "linhas_cadastradas": len(LINHAS_CONHECIDAS),
+            # No modo pool o OCR (e o cache) roda nos workers
+            "cache_ocr": fila_inferencia.stats_cache_ocr() if DETECTOR_WORKERS > 0 else cache_ocr.stats(),
+            "jobs": jobs.stats(),
+            "quadro": quadro_chegadas.stats(),
+            "expiracao": tarefa_expirar.stats(),
+            "tempo_viagem": estimador_viagem.stats(),
+            "rollup": {
+                **tarefa_rollup.stats(),
+                "baldes_pendentes": agregador_deteccoes.pendentes(),
+                "baldes_gravados": agregador_deteccoes.gravados
+            },
+            "contadores": {
+                "reconciliacoes": resumo["reconciliacoes"],
+                "ultima_deriva": resumo["ultima_deriva"],
+                "reconciliado_ha_s": resumo.get("reconciliado_ha_s")
+            },
+            "escrita": {
+                "deteccoes": escritor_deteccoes.stats(),
+                "logs": escritor_logs.stats()
+            }
         })
         
     except Exception as e:
@@ -0,0 +1,117 @@
+"""
+Aquecimento - Carrega e aquece os modelos em segundo plano
+Sistema BRT Recife
+
+Carregar YOLO + EasyOCR leva dezenas de segundos em CPU. Se isso acontece
+no import, o Flask só abre a porta depois e o health check do Render falha
+no cold start. Aqui o carregamento (e uma inferência de aquecimento num
+frame vazio) roda numa thread; o servidor sobe na hora e responde
+"warming" até os modelos ficarem prontos.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+
+def aquecer_modelos(model, reader=None, perfil=None):
+    """
+    Inferência de aquecimento num frame vazio e num letreiro sintético
+    
+    A primeira chamada do YOLO/EasyOCR paga alocação de memória e
+    inicialização dos kernels; melhor pagar aqui do que no primeiro frame.
+    
+    Args:
+        model: YOLO carregado
+        reader: easyocr.Reader (opcional)
+        perfil: PerfilDeteccao com os argumentos usados nas requisições
+    """
+    kwargs = perfil.kwargs_yolo() if perfil is not None else {"conf": 0.5}
+    lado = kwargs.get("imgsz", 640)
+    model(np.zeros((lado, lado, 3), dtype=np.uint8), verbose=False, **kwargs)
+    
+    if reader is not None:
+        letreiro = np.full((64, 200), 255, dtype=np.uint8)
+        cv2.putText(letreiro, "437", (20, 48), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+        reader.readtext(letreiro)
+
+
+class CarregadorModelos:
+    """
+    Executa uma função de carregamento uma única vez, em segundo plano
+    
+    Estados: "pendente" → "aquecendo" → "pronto" (ou "erro").
+    
+    Attributes:
+        carregar (callable): função sem argumentos que carrega e aquece
+            os modelos e devolve o que deve ser guardado
+        modelos: retorno de carregar (None até ficar pronto)
+        erro (str): mensagem da falha, se houver
+    
+    Example:
+        >>> carregador = CarregadorModelos(carregar_modelos)
+        >>> carregador.iniciar()
+        >>> if not carregador.pronto():
+        ...     return resposta_aquecendo()
+    """
+    
+    def __init__(self, carregar, nome="modelos"):
+        self.carregar = carregar
+        self.nome = nome
+        self.modelos = None
+        self.erro = None
+        self.estado = "pendente"
+        self._inicio = None
+        self._duracao_s = None
+        self._pronto = threading.Event()
+        self._lock = threading.Lock()
+    
+    def iniciar(self):
+        """Dispara o carregamento numa thread (chamadas repetidas são ignoradas)"""
+        with self._lock:
+            if self.estado != "pendente":
+                return
+            self.estado = "aquecendo"
+            self._inicio = time.monotonic()
+        
+        threading.Thread(target=self._executar, name=f"aquecimento-{self.nome}", daemon=True).start()
+    
+    def _executar(self):
+        try:
+            self.modelos = self.carregar()
+            self.estado = "pronto"
+            self._duracao_s = time.monotonic() - self._inicio
+            print(f"✅ {self.nome} prontos em {self._duracao_s:.1f}s")
+        except Exception as e:
+            self.erro = str(e)
+            self.estado = "erro"
+            print(f"❌ Falha ao carregar {self.nome}: {e}")
+        finally:
+            self._pronto.set()
+    
+    def pronto(self):
+        """True quando os modelos foram carregados e aquecidos"""
+        return self.estado == "pronto"
+    
+    def obter(self, timeout=None):
+        """
+        Modelos carregados, iniciando o carregamento se preciso (lazy)
+        
+        Returns:
+            retorno de carregar, ou None se não ficou pronto no timeout
+        """
+        self.iniciar()
+        self._pronto.wait(timeout)
+        return self.modelos
+    
+    def to_dict(self):
+        """Resumo para o /health"""
+        info = {"estado": self.estado}
+        if self._duracao_s is not None:
+            info["carregado_em_s"] = round(self._duracao_s, 1)
+        elif self._inicio is not None and self.estado == "aquecendo":
+            info["aquecendo_ha_s"] = round(time.monotonic() - self._inicio, 1)
+        if self.erro:
+            info["erro"] = self.erro
+        return info
@@ -0,0 +1,80 @@
+"""
+Backends do YOLO - PyTorch, ONNX Runtime ou OpenVINO (CPU)
+Sistema BRT Recife
+
+O Render free não tem GPU. Exportar o yolov8n para ONNX/OpenVINO uma vez
+e rodar nesses runtimes costuma ser bem mais rápido que o PyTorch eager
+em CPU. Se o backend escolhido não estiver disponível (pacote ausente,
+falha na exportação ou na inferência de teste), volta para o PyTorch.
+"""
+import os
+
+import numpy as np
+
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+
+def caminho_exportado(pesos, backend, int8=False):
+    """
+    Caminho onde o ultralytics grava o modelo exportado
+    
+    Args:
+        pesos: arquivo .pt (ex: "yolov8n.pt")
+        backend: "onnx" ou "openvino"
+        int8: quantização INT8 (só OpenVINO)
+    
+    Returns:
+        str: arquivo .onnx ou diretório *_openvino_model
+    """
+    base = os.path.splitext(pesos)[0]
+    
+    if backend == "onnx":
+        return f"{base}.onnx"
+    
+    return f"{base}{'_int8' if int8 else ''}_openvino_model"
+
+
+def carregar_yolo(backend="pytorch", pesos="yolov8n.pt", int8=False):
+    """
+    Carrega o YOLO no backend escolhido, exportando na primeira vez
+    
+    Args:
+        backend: "pytorch", "onnx" ou "openvino"
+        pesos: arquivo .pt original
+        int8: quantizar para INT8 na exportação (OpenVINO/NNCF)
+    
+    Returns:
+        YOLO: modelo pronto (PyTorch se o backend pedido falhar)
+    """
+    from ultralytics import YOLO
+    
+    if backend not in BACKENDS:
+        print(f"⚠️  Backend '{backend}' desconhecido, usando PyTorch")
+        backend = "pytorch"
+    
+    if backend == "pytorch":
+        return YOLO(pesos)
+    
+    # O export ONNX do ultralytics não quantiza; INT8 só via OpenVINO
+    int8 = int8 and backend == "openvino"
+    
+    try:
+        caminho = caminho_exportado(pesos, backend, int8)
+        
+        if not os.path.exists(caminho):
+            print(f"📦 Exportando {pesos} para {backend}{' INT8' if int8 else ''}...")
+            # dynamic=True: aceita lotes de tamanho variável (upload em lote)
+            caminho = YOLO(pesos).export(format=backend, int8=int8, dynamic=True)
+        
+        modelo = YOLO(caminho, task="detect")
+        
+        # Inferência de teste: falha aqui cai no PyTorch em vez de na 1ª requisição
+        modelo(np.zeros((640, 640, 3), dtype=np.uint8), verbose=False)
+        
+        print(f"✅ YOLO carregado via {backend} ({caminho})")
+        return modelo
+    
+    except Exception as e:
+        print(f"⚠️  Backend {backend} indisponível ({e}), usando PyTorch")
+        return YOLO(pesos)
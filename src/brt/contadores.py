@@ -0,0 +1,96 @@
+"""
+Contadores de Detecções - Estatísticas mantidas em memória
+Sistema BRT Recife
+
+O /stats contava a collection inteira a cada chamada (três count_documents
+e um $group). Aqui os totais por status e por linha são atualizados quando
+uma detecção é registrada ou muda de status, e o /stats só lê os
+contadores. Como o índice TTL apaga detecções e outros processos também
+gravam, uma tarefa periódica recalcula tudo com uma agregação só
+(reconciliar) e corrige a diferença.
+"""
+import threading
+import time
+from collections import Counter
+
+
+class ContadoresDeteccoes:
+    """
+    Totais de detecções por status e por linha
+    
+    Attributes:
+        reconciliacoes (int): quantas vezes os contadores foram recalculados
+        ultima_deriva (int): soma das diferenças corrigidas na última reconciliação
+    
+    Example:
+        >>> contadores = ContadoresDeteccoes()
+        >>> contadores.registrar("437")
+        >>> contadores.mudar_status("em_rota", "expirado", 3)
+        >>> contadores.resumo()["total"]
+    """
+    
+    def __init__(self):
+        self.reconciliacoes = 0
+        self.ultima_deriva = 0
+        self._por_status = Counter()
+        self._por_linha = Counter()
+        self._reconciliado_em = None
+        self._lock = threading.Lock()
+    
+    def registrar(self, linha, status="em_rota"):
+        """Uma detecção nova"""
+        with self._lock:
+            self._por_status[status] += 1
+            self._por_linha[linha] += 1
+    
+    def mudar_status(self, de, para, quantidade=1):
+        """quantidade detecções passaram do status de para o status para"""
+        if quantidade <= 0:
+            return
+        with self._lock:
+            self._por_status[de] -= quantidade
+            self._por_status[para] += quantidade
+    
+    def reconciliar(self, grupos):
+        """
+        Substitui os contadores pela contagem real
+        
+        Args:
+            grupos: documentos {"_id": {"linha": ..., "status": ...}, "count": n}
+                (resultado de um $group por linha e status)
+        """
+        por_status = Counter()
+        por_linha = Counter()
+        for grupo in grupos:
+            por_status[grupo["_id"]["status"]] += grupo["count"]
+            por_linha[grupo["_id"]["linha"]] += grupo["count"]
+        
+        with self._lock:
+            chaves = set(por_status) | set(self._por_status)
+            self.ultima_deriva = sum(abs(por_status[c] - self._por_status[c]) for c in chaves)
+            self._por_status = por_status
+            self._por_linha = por_linha
+            self._reconciliado_em = time.monotonic()
+            self.reconciliacoes += 1
+    
+    def resumo(self, top=5):
+        """
+        Totais para o /stats (O(linhas), sem consultar o banco)
+        
+        Returns:
+            dict: total, contagem por status e as linhas mais detectadas
+        """
+        with self._lock:
+            info = {
+                "total": sum(self._por_status.values()),
+                "por_status": {status: n for status, n in self._por_status.items() if n},
+                "top_linhas": [
+                    {"_id": linha, "count": n}
+                    for linha, n in self._por_linha.most_common(top) if n
+                ],
+                "reconciliacoes": self.reconciliacoes,
+                "ultima_deriva": self.ultima_deriva
+            }
+            if self._reconciliado_em is not None:
+                info["reconciliado_ha_s"] = round(time.monotonic() - self._reconciliado_em, 1)
+            return info
@@ -1,10 +1,18 @@
 """
 Detector de Ônibus - YOLO + OCR
 """
-from ultralytics import YOLO
 import easyocr
-import cv2
-import numpy as np
+
+from .letreiro import (
+    recortar_letreiro,
+    preprocessar_letreiro,
+    buscar_linha_valida,
+    empilhar_letreiros,
+)
+from .ocr_cache import CacheOCR, hash_letreiro
+from .backends import carregar_yolo
+from .perfil import PerfilDeteccao
+from .aquecimento import aquecer_modelos
 
 
 class BusDetector:
@@ -12,29 +20,44 @@ class BusDetector:
     Detecta ônibus em imagens usando YOLOv8 + EasyOCR
     """
     
-    def __init__(self, linhas_validas):
+    def __init__(self, linhas_validas, cache_ocr=None, backend="pytorch", int8=False, perfil=None,
+                 reconhecedor=None):
         """
         Args:
             linhas_validas: lista de linhas válidas (ex: ["437", "2441", ...])
+            cache_ocr: CacheOCR compartilhado (default: um cache próprio)
+            backend: backend do YOLO ("pytorch", "onnx" ou "openvino")
+            int8: modelo exportado quantizado em INT8 (OpenVINO)
+            perfil: PerfilDeteccao (classes, imgsz, ROI por câmera)
+            reconhecedor: ReconhecedorLinha tentado antes do EasyOCR (opcional)
         """
         self.linhas_validas = linhas_validas
-        self.model = YOLO("yolov8n.pt")
+        self.cache_ocr = cache_ocr if cache_ocr is not None else CacheOCR()
+        self.perfil = perfil if perfil is not None else PerfilDeteccao()
+        self.reconhecedor = reconhecedor
+        self.model = carregar_yolo(backend, int8=int8)
         self.reader = easyocr.Reader(['pt', 'en'], gpu=False)
         print(f"✅ BusDetector inicializado ({len(linhas_validas)} linhas)")
     
-    def detectar_linha(self, img):
+    def aquecer(self):
+        """Inferência de aquecimento (o primeiro frame real não paga a inicialização)"""
+        aquecer_modelos(self.model, self.reader, self.perfil)
+    
+    def detectar_linha(self, img, camera_id=None):
         """
         Detecta ônibus e identifica linha do letreiro
         
         Args:
             img: imagem numpy array (BGR)
+            camera_id: câmera de origem (para a ROI do perfil)
             
         Returns:
             str ou None: número da linha detectada
         """
         try:
-            # 1. YOLO detecta ônibus
-            results = self.model(img, conf=0.5)[0]
+            # 1. YOLO detecta ônibus (só na ROI da câmera)
+            img = self.perfil.recortar_roi(img, camera_id)
+            results = self.model(img, **self.perfil.kwargs_yolo())[0]
             
             for det in results.boxes:
                 cls_id = int(det.cls[0])
@@ -44,43 +67,119 @@ class BusDetector:
                     confidence = float(det.conf[0])
                     print(f"🚌 Ônibus detectado (conf: {confidence:.2f})")
                     
-                    # 2. Recortar região do ônibus
-                    x1, y1, x2, y2 = map(int, det.xyxy[0])
-                    onibus_crop = img[y1:y2, x1:x2]
+                    # 2-3. Recortar ônibus e focar no letreiro (parte superior)
+                    letreiro_crop = recortar_letreiro(img, det.xyxy[0])
                     
-                    if onibus_crop.size == 0:
+                    if letreiro_crop is None:
                         continue
                     
-                    # 3. Focar no letreiro (parte superior)
-                    altura = onibus_crop.shape[0]
-                    letreiro_crop = onibus_crop[0:int(altura*0.35), :]
+                    # Letreiro já lido num frame anterior desta câmera?
+                    chave = hash_letreiro(letreiro_crop)
+                    encontrado, linha = self.cache_ocr.obter(chave, camera_id)
                     
-                    # 4. Pré-processamento
-                    gray = cv2.cvtColor(letreiro_crop, cv2.COLOR_BGR2GRAY)
-                    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                    enhanced = clahe.apply(gray)
-                    thresh = cv2.adaptiveThreshold(
-                        enhanced, 255,
-                        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                        cv2.THRESH_BINARY, 11, 2
-                    )
+                    if not encontrado and self.reconhecedor is not None:
+                        # Leitor de dígitos (EasyOCR só se a leitura for incerta)
+                        leituras = self.reconhecedor.ler(letreiro_crop)
+                        if leituras:
+                            encontrado, linha = True, leituras[0][0]
+                            self.cache_ocr.guardar(chave, linha, camera_id)
                     
-                    # 5. OCR
-                    print("🔍 Executando OCR...")
-                    ocr_results = self.reader.readtext(thresh)
-                    
-                    # 6. Procurar linhas válidas
-                    for (bbox, text, conf_ocr) in ocr_results:
-                        numeros = ''.join(filter(str.isdigit, text))
-                        print(f"   OCR: '{text}' → '{numeros}' (conf: {conf_ocr:.2f})")
+                    if not encontrado:
+                        # 4. Pré-processamento
+                        thresh = preprocessar_letreiro(letreiro_crop)
+                        
+                        # 5. OCR
+                        print("🔍 Executando OCR...")
+                        ocr_results = self.reader.readtext(thresh)
                         
-                        if numeros in self.linhas_validas and conf_ocr > 0.4:
-                            print(f"✅ LINHA {numeros} IDENTIFICADA!")
-                            return numeros
+                        # 6. Procurar linhas válidas
+                        linha = buscar_linha_valida(ocr_results, self.linhas_validas)
+                        self.cache_ocr.guardar(chave, linha, camera_id)
+                    
+                    if linha:
+                        return linha
             
             print("ℹ️  Nenhuma linha válida detectada")
             return None
             
         except Exception as e:
             print(f"❌ Erro na detecção: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def detectar_linhas(self, imgs, cameras=None):
+        """
+        Versão em lote de detectar_linha
+        
+        Uma única chamada do YOLO para todas as imagens e uma única
+        passada do EasyOCR para os letreiros que o leitor de dígitos
+        não leu com confiança.
+        
+        Args:
+            imgs: lista de imagens numpy array (BGR)
+            cameras: camera_id de cada imagem (para a ROI do perfil)
+        
+        Returns:
+            list: número da linha (ou None) de cada imagem, na mesma ordem
+        """
+        linhas = [None] * len(imgs)
+        
+        if not imgs:
+            return linhas
+        
+        try:
+            # 1. YOLO em lote (só na ROI de cada câmera)
+            cameras = cameras or [None] * len(imgs)
+            imgs = [self.perfil.recortar_roi(img, c) for img, c in zip(imgs, cameras)]
+            resultados = self.model(imgs, **self.perfil.kwargs_yolo())
+            
+            # 2. Recortar todos os letreiros (guardando a imagem de origem);
+            #    letreiros já lidos saem do cache, sem OCR
+            indices = []
+            chaves = []
+            letreiros = []
+            for i, (img, results) in enumerate(zip(imgs, resultados)):
+                for det in results.boxes:
+                    if self.model.names[int(det.cls[0])] != "bus":
+                        continue
+                    
+                    letreiro_crop = recortar_letreiro(img, det.xyxy[0])
+                    if letreiro_crop is None:
+                        continue
+                    
+                    chave = hash_letreiro(letreiro_crop)
+                    encontrado, linha = self.cache_ocr.obter(chave, cameras[i])
+                    if not encontrado and self.reconhecedor is not None:
+                        leituras = self.reconhecedor.ler(letreiro_crop)
+                        if leituras:
+                            encontrado, linha = True, leituras[0][0]
+                            self.cache_ocr.guardar(chave, linha, cameras[i])
+                    
+                    if encontrado:
+                        if linhas[i] is None:
+                            linhas[i] = linha
+                        continue
+                    
+                    indices.append(i)
+                    chaves.append(chave)
+                    letreiros.append(preprocessar_letreiro(letreiro_crop))
+            
+            if not letreiros:
+                print("ℹ️  Nenhum letreiro novo para OCR no lote")
+                return linhas
+            
+            # 3. OCR em lote
+            print(f"🔍 Executando OCR em lote ({len(letreiros)} letreiros)...")
+            ocr_lote = self.reader.readtext_batched(empilhar_letreiros(letreiros))
+            
+            # 4. Primeira linha válida de cada imagem
+            for i, chave, ocr_results in zip(indices, chaves, ocr_lote):
+                linha = buscar_linha_valida(ocr_results, self.linhas_validas)
+                self.cache_ocr.guardar(chave, linha, cameras[i])
+                if linhas[i] is None:
+                    linhas[i] = linha
+            
+            return linhas
+        
+        except Exception as e:
+            print(f"❌ Erro na detecção em lote: {e}")
+            return [None] * len(imgs)
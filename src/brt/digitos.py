@@ -0,0 +1,281 @@
+"""
+Reconhecedor de Linha - Leitura dos dígitos do letreiro por templates
+Sistema BRT Recife
+
+O EasyOCR roda detecção + reconhecimento genéricos (pt + en) em cada
+letreiro, mas só precisamos ler números de 3-4 dígitos de um conjunto
+pequeno e conhecido. Aqui o letreiro é binarizado, os dígitos são
+segmentados por componentes conexos e cada um é comparado (correlação
+normalizada) com templates de 0-9. A decodificação só aceita linhas
+conhecidas, e cada dígito da linha precisa ser o mais parecido com o seu
+glifo (um "2541" não vira 2441 só porque três dígitos batem); se a
+confiança for baixa ou duas linhas empatarem, a leitura fica vazia e o
+chamador volta para o EasyOCR.
+"""
+import glob
+import os
+
+import cv2
+import numpy as np
+
+
+# Lado do glifo normalizado (o dígito é centralizado num quadrado)
+TAMANHO_GLIFO = 32
+
+# Fontes do OpenCV usadas para gerar templates quando não há recortes reais
+FONTES_TEMPLATE = (
+    cv2.FONT_HERSHEY_SIMPLEX,
+    cv2.FONT_HERSHEY_DUPLEX,
+    cv2.FONT_HERSHEY_TRIPLEX,
+)
+ESPESSURAS_TEMPLATE = (2, 4, 6)
+
+
+def normalizar_glifo(glifo):
+    """
+    Centraliza um glifo binário num quadrado TAMANHO_GLIFO, mantendo a proporção
+    
+    Args:
+        glifo: recorte binário (dígito = 255) justo no dígito
+    
+    Returns:
+        numpy array float32 com média zero e norma 1 (achatado), ou None
+    """
+    altura, largura = glifo.shape[:2]
+    if altura == 0 or largura == 0:
+        return None
+    
+    escala = (TAMANHO_GLIFO - 2) / float(max(altura, largura))
+    nova_altura = max(1, int(round(altura * escala)))
+    nova_largura = max(1, int(round(largura * escala)))
+    reduzido = cv2.resize(glifo, (nova_largura, nova_altura), interpolation=cv2.INTER_AREA)
+    
+    quadro = np.zeros((TAMANHO_GLIFO, TAMANHO_GLIFO), dtype=np.float32)
+    y = (TAMANHO_GLIFO - nova_altura) // 2
+    x = (TAMANHO_GLIFO - nova_largura) // 2
+    quadro[y:y + nova_altura, x:x + nova_largura] = reduzido
+    
+    vetor = quadro.ravel()
+    vetor -= vetor.mean()
+    norma = np.linalg.norm(vetor)
+    if norma == 0:
+        return None
+    
+    return vetor / norma
+
+
+def recortar_tinta(binaria):
+    """Recorte justo na região com pixels acesos (None se vazia)"""
+    pontos = cv2.findNonZero(binaria)
+    if pontos is None:
+        return None
+    
+    x, y, w, h = cv2.boundingRect(pontos)
+    return binaria[y:y + h, x:x + w]
+
+
+def gerar_templates():
+    """
+    Templates sintéticos de 0-9 desenhados com as fontes do OpenCV
+    
+    Returns:
+        dict: dígito (str) -> lista de vetores normalizados
+    """
+    templates = {str(d): [] for d in range(10)}
+    
+    for digito in templates:
+        for fonte in FONTES_TEMPLATE:
+            for espessura in ESPESSURAS_TEMPLATE:
+                tela = np.zeros((120, 100), dtype=np.uint8)
+                cv2.putText(tela, digito, (10, 100), fonte, 3, 255, espessura, cv2.LINE_AA)
+                _, tela = cv2.threshold(tela, 127, 255, cv2.THRESH_BINARY)
+                
+                glifo = recortar_tinta(tela)
+                vetor = normalizar_glifo(glifo) if glifo is not None else None
+                if vetor is not None:
+                    templates[digito].append(vetor)
+    
+    return templates
+
+
+def carregar_templates(diretorio):
+    """
+    Templates a partir de recortes reais de dígitos dos letreiros
+    
+    Os arquivos devem começar pelo dígito (ex: "4_camera_A_001.png").
+    
+    Returns:
+        dict: dígito (str) -> lista de vetores normalizados
+    """
+    templates = {str(d): [] for d in range(10)}
+    
+    for caminho in glob.glob(os.path.join(diretorio, "*.png")):
+        digito = os.path.basename(caminho)[0]
+        if digito not in templates:
+            continue
+        
+        img = cv2.imread(caminho, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            continue
+        
+        _, binaria = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if binaria.mean() > 127:
+            binaria = 255 - binaria
+        
+        glifo = recortar_tinta(binaria)
+        vetor = normalizar_glifo(glifo) if glifo is not None else None
+        if vetor is not None:
+            templates[digito].append(vetor)
+    
+    return templates
+
+
+class ReconhecedorLinha:
+    """
+    Lê o número da linha no letreiro restrito às linhas conhecidas
+    
+    Devolve leituras no mesmo formato de leituras_validas ([(linha, conf)]),
+    então o resultado entra no cache de OCR e na votação das trilhas como
+    uma leitura do EasyOCR.
+    
+    Attributes:
+        linhas_validas (list): linhas numéricas aceitas na decodificação
+        limiar (float): confiança mínima (média da correlação dos dígitos)
+        limiar_digito (float): correlação mínima de cada dígito
+        margem (float): vantagem mínima da melhor linha sobre a segunda
+    
+    Example:
+        >>> reconhecedor = ReconhecedorLinha(["437", "2441", "2444"])
+        >>> leituras = reconhecedor.ler(letreiro_crop)
+        >>> if not leituras:
+        ...     leituras = leituras_validas(reader.readtext(thresh), linhas)
+    """
+    
+    ALTURA_MIN = 0.25  # altura mínima do dígito em relação ao letreiro
+    ALTURA_MAX = 0.95
+    
+    def __init__(self, linhas_validas, limiar=0.75, limiar_digito=0.6, margem=0.05,
+                 diretorio_templates=None):
+        self.linhas_validas = [l for l in linhas_validas if l.isdigit()]
+        self.limiar = limiar
+        self.limiar_digito = limiar_digito
+        self.margem = margem
+        self._tamanhos = sorted({len(l) for l in self.linhas_validas})
+        
+        templates = gerar_templates()
+        if diretorio_templates:
+            for digito, vetores in carregar_templates(diretorio_templates).items():
+                templates[digito].extend(vetores)
+        
+        # Matriz (n_templates x pixels) e o dígito de cada linha dela
+        self._digitos = np.array([int(d) for d, vs in templates.items() for _ in vs])
+        self._templates = np.stack([v for vs in templates.values() for v in vs])
+    
+    def _escores(self, glifo):
+        """Melhor correlação do glifo com cada dígito (array de 10)"""
+        vetor = normalizar_glifo(glifo)
+        escores = np.zeros(10, dtype=np.float32)
+        if vetor is None:
+            return escores
+        
+        correlacoes = self._templates @ vetor
+        np.maximum.at(escores, self._digitos, correlacoes)
+        return escores
+    
+    def _sequencias(self, binaria):
+        """
+        Segmenta os dígitos e agrupa em sequências alinhadas
+        
+        Returns:
+            list: sequências de glifos binários, da esquerda para a direita
+        """
+        altura = binaria.shape[0]
+        n, _, stats, _ = cv2.connectedComponentsWithStats(binaria, connectivity=8)
+        
+        caixas = []
+        for x, y, w, h, area in stats[1:n]:
+            if not (self.ALTURA_MIN * altura <= h <= self.ALTURA_MAX * altura):
+                continue
+            if not (0.1 <= w / float(h) <= 1.2) or area < 0.15 * w * h:
+                continue
+            caixas.append((x, y, w, h))
+        
+        caixas.sort()
+        
+        # Dígitos da mesma linha: alturas parecidas, alinhados e próximos
+        grupos = []
+        for caixa in caixas:
+            x, y, w, h = caixa
+            for grupo in grupos:
+                gx, gy, gw, gh = grupo[-1]
+                if (
+                    abs(h - gh) <= 0.25 * gh
+                    and abs((y + h / 2) - (gy + gh / 2)) <= 0.3 * gh
+                    and -0.2 * gh <= x - (gx + gw) <= gh
+                ):
+                    grupo.append(caixa)
+                    break
+            else:
+                grupos.append([caixa])
+        
+        sequencias = []
+        for grupo in grupos:
+            glifos = [binaria[y:y + h, x:x + w] for x, y, w, h in grupo]
+            
+            # Grupos mais longos (destino colado no número) viram janelas
+            for tamanho in self._tamanhos:
+                for inicio in range(len(glifos) - tamanho + 1):
+                    sequencias.append(glifos[inicio:inicio + tamanho])
+        
+        return sequencias
+    
+    def ler(self, letreiro_crop):
+        """
+        Lê a linha do letreiro
+        
+        Args:
+            letreiro_crop: recorte do letreiro (BGR ou cinza), antes do
+                pré-processamento do EasyOCR
+        
+        Returns:
+            list: [(linha, conf)] se a leitura for confiável, senão []
+        """
+        if letreiro_crop is None or letreiro_crop.size == 0 or not self.linhas_validas:
+            return []
+        
+        gray = letreiro_crop
+        if gray.ndim == 3:
+            gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+        
+        _, binaria = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        
+        # Letreiro de LED (dígito claro) ou impresso (dígito escuro)
+        candidatos = {}
+        for polaridade in (binaria, 255 - binaria):
+            for glifos in self._sequencias(polaridade):
+                escores = [self._escores(g) for g in glifos]
+                
+                # Dígito lido em cada glifo: o template mais parecido, se for confiável
+                lidos = "".join(
+                    str(int(e.argmax())) if e.max() >= self.limiar_digito else "?"
+                    for e in escores
+                )
+                
+                for linha in self.linhas_validas:
+                    if linha != lidos:
+                        continue
+                    conf = float(np.mean([e[int(d)] for e, d in zip(escores, linha)]))
+                    candidatos[linha] = max(candidatos.get(linha, 0.0), conf)
+        
+        if not candidatos:
+            return []
+        
+        ordenados = sorted(candidatos.items(), key=lambda item: item[1], reverse=True)
+        linha, conf = ordenados[0]
+        segunda = ordenados[1][1] if len(ordenados) > 1 else 0.0
+        
+        if conf < self.limiar or conf - segunda < self.margem:
+            return []
+        
+        print(f"   Dígitos leram: '{linha}' (conf: {conf:.2f})")
+        return [(linha, conf)]
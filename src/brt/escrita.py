@@ -0,0 +1,205 @@
+"""
+Escrita em Lote - Write-behind das inserções no MongoDB
+Sistema BRT Recife
+
+Cada insert_one no Atlas é uma ida e volta pela rede dentro da requisição.
+Aqui os documentos entram numa fila em memória e uma thread grava em lote
+com insert_many(ordered=False), quando o lote enche ou o intervalo passa.
+O _id é gerado no cliente (ObjectId), então quem insere já sabe o id sem
+esperar o banco. A fila é limitada: cheia, quem insere espera um pouco
+(backpressure) e depois desiste. Na saída do processo a fila é esvaziada.
+"""
+import atexit
+import queue
+import threading
+import time
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from .scheduler import FilaCheiaError
+
+
+class EscritorMongo:
+    """
+    Fila de documentos gravada em lote numa collection
+    
+    Attributes:
+        colecao: collection do pymongo
+        max_lote (int): documentos por insert_many
+        intervalo_s (float): tempo máximo que um documento espera na fila
+        max_tentativas (int): tentativas de gravar um lote antes de descartá-lo
+        gravados (int): documentos gravados
+        perdidos (int): documentos descartados (fila cheia ou falhas seguidas)
+    
+    Example:
+        >>> escritor = EscritorMongo(db["logs_sistema"])
+        >>> escritor.inserir({"tipo": "info", "mensagem": "..."}, bloquear=False)
+    """
+    
+    def __init__(self, colecao, max_lote=100, intervalo_s=1.0, max_fila=10000, max_tentativas=3):
+        self.colecao = colecao
+        self.max_lote = max_lote
+        self.intervalo_s = intervalo_s
+        self.max_tentativas = max_tentativas
+        self.gravados = 0
+        self.perdidos = 0
+        self.lotes = 0
+        
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._em_gravacao = []  # lote sendo gravado agora (ainda não está no banco)
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        
+        self._thread = threading.Thread(
+            target=self._loop, name=f"escritor-{colecao.name}", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.encerrar)
+    
+    def inserir(self, doc, bloquear=True, timeout=2.0):
+        """
+        Enfileira um documento para a próxima gravação em lote
+        
+        Args:
+            doc: documento (recebe um _id ObjectId se não tiver)
+            bloquear: esperar vaga com a fila cheia (False = descarta na hora)
+            timeout: quanto esperar por vaga (s)
+        
+        Returns:
+            ObjectId: _id do documento
+        
+        Raises:
+            FilaCheiaError: se a fila continuar cheia
+        """
+        doc.setdefault("_id", ObjectId())
+        
+        try:
+            self._fila.put(doc, block=bloquear, timeout=timeout if bloquear else None)
+        except queue.Full:
+            with self._lock:
+                self.perdidos += 1
+            raise FilaCheiaError(f"Fila de escrita de {self.colecao.name} cheia")
+        
+        return doc["_id"]
+    
+    def pendentes(self, filtro=None):
+        """
+        Documentos ainda não gravados (na fila ou no lote em gravação)
+        
+        Args:
+            filtro: função doc -> bool (opcional)
+        
+        Returns:
+            list: documentos pendentes que passam no filtro
+        """
+        with self._fila.mutex:
+            docs = list(self._fila.queue)
+        with self._lock:
+            docs.extend(self._em_gravacao)
+        
+        if filtro is None:
+            return docs
+        return [doc for doc in docs if filtro(doc)]
+    
+    def _coletar_lote(self):
+        """
+        Espera o primeiro documento e junta os que chegarem até o intervalo
+        
+        O lote fica em _em_gravacao enquanto é montado, para os documentos
+        continuarem visíveis em pendentes() ao saírem da fila.
+        """
+        try:
+            doc = self._fila.get(timeout=self.intervalo_s)
+        except queue.Empty:
+            return []
+        
+        with self._lock:
+            self._em_gravacao = lote = [doc]
+        
+        limite = time.monotonic() + self.intervalo_s
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                doc = self._fila.get(timeout=restante)
+            except queue.Empty:
+                break
+            with self._lock:
+                lote.append(doc)
+        
+        return lote
+    
+    def _gravar(self, lote):
+        """insert_many com novas tentativas; ids já gravados não duplicam"""
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                self.colecao.insert_many(lote, ordered=False)
+                escritos = len(lote)
+            except BulkWriteError as e:
+                # ordered=False: numa nova tentativa, só os documentos que já
+                # tinham sido gravados falham (duplicate key); os outros entram
+                erros = e.details.get("writeErrors", [])
+                if not all(err.get("code") == 11000 for err in erros):
+                    escritos = None
+                    falha = e
+                else:
+                    escritos = e.details.get("nInserted", 0)
+            except Exception as e:
+                escritos = None
+                falha = e
+            
+            if escritos is not None:
+                with self._lock:
+                    self.gravados += escritos
+                    self.lotes += 1
+                break
+            
+            print(f"⚠️  Falha ao gravar lote em {self.colecao.name} "
+                  f"(tentativa {tentativa}/{self.max_tentativas}): {falha}")
+            if tentativa == self.max_tentativas:
+                with self._lock:
+                    self.perdidos += len(lote)
+            else:
+                time.sleep(min(2 ** tentativa, 10))
+        
+        with self._lock:
+            self._em_gravacao = []
+        
+        for _ in lote:
+            self._fila.task_done()
+    
+    def _loop(self):
+        while not self._parar.is_set() or not self._fila.empty():
+            lote = self._coletar_lote()
+            if lote:
+                self._gravar(lote)
+    
+    def flush(self, timeout=None):
+        """Espera todos os documentos enfileirados até agora serem gravados"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        return True
+    
+    def encerrar(self, timeout=10):
+        """Grava o que restou na fila e para a thread (chamado no atexit)"""
+        if self._parar.is_set():
+            return
+        self._parar.set()
+        self._thread.join(timeout)
+    
+    def stats(self):
+        """Contadores para o /stats"""
+        with self._lock:
+            return {
+                "pendentes": self._fila.qsize() + len(self._em_gravacao),
+                "gravados": self.gravados,
+                "perdidos": self.perdidos,
+                "lotes": self.lotes
+            }
@@ -0,0 +1,113 @@
+"""
+Anel de Frames - Buffer de frames decodificados em memória compartilhada
+Sistema BRT Recife
+
+Um único bloco de memória compartilhada dividido em slots de tamanho fixo.
+O processo web escreve o frame BGR decodificado uma vez num slot livre e os
+processos de detecção leem o slot no lugar, como uma view NumPy, sem pickle
+e sem cópia. Slots voltam para a lista de livres quando a detecção termina
+(a ordem de término varia entre workers, então a reutilização não é
+estritamente circular).
+"""
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .scheduler import FilaCheiaError
+
+
+class FrameRing:
+    """
+    Buffer de frames em memória compartilhada com slots fixos
+    
+    Attributes:
+        nome (str): nome do bloco de memória (para anexar nos workers)
+        num_slots (int): quantidade de slots
+        bytes_por_slot (int): tamanho máximo de um frame (altura*largura*3)
+    
+    Example:
+        >>> ring = FrameRing(num_slots=16, bytes_por_slot=1280 * 720 * 3)
+        >>> slot = ring.escrever(img)               # processo web
+        >>> view = ring.view(slot, img.shape, img.dtype)  # worker
+        >>> ring.liberar(slot)
+    """
+    
+    def __init__(self, num_slots, bytes_por_slot, nome=None):
+        """
+        Cria o bloco (nome=None) ou anexa a um bloco existente (nome=...)
+        
+        Args:
+            num_slots: quantidade de slots
+            bytes_por_slot: tamanho de cada slot em bytes
+            nome: nome de um bloco já criado por outro processo
+        """
+        self.num_slots = num_slots
+        self.bytes_por_slot = bytes_por_slot
+        self.dono = nome is None
+        
+        if self.dono:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=num_slots * bytes_por_slot
+            )
+            self._livres = queue.Queue()
+            for slot in range(num_slots):
+                self._livres.put(slot)
+        else:
+            self._shm = shared_memory.SharedMemory(name=nome)
+            self._livres = None
+        
+        self.nome = self._shm.name
+    
+    @classmethod
+    def anexar(cls, nome, num_slots, bytes_por_slot):
+        """Abre, em outro processo, um anel criado pelo processo web"""
+        return cls(num_slots, bytes_por_slot, nome=nome)
+    
+    def cabe(self, img):
+        """True se o frame cabe em um slot"""
+        return img.nbytes <= self.bytes_por_slot
+    
+    def view(self, slot, shape, dtype):
+        """
+        View NumPy do frame guardado no slot (sem cópia)
+        
+        Returns:
+            numpy array apontando para a memória compartilhada
+        """
+        inicio = slot * self.bytes_por_slot
+        return np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=inicio)
+    
+    def escrever(self, img):
+        """
+        Reserva um slot livre e copia o frame para ele (única cópia)
+        
+        Returns:
+            int: número do slot
+        
+        Raises:
+            FilaCheiaError: se todos os slots estiverem ocupados
+            ValueError: se o frame não couber no slot
+        """
+        if not self.cabe(img):
+            raise ValueError(
+                f"Frame de {img.nbytes} bytes não cabe no slot ({self.bytes_por_slot} bytes)"
+            )
+        
+        try:
+            slot = self._livres.get_nowait()
+        except queue.Empty:
+            raise FilaCheiaError(f"Anel de frames cheio ({self.num_slots} slots)")
+        
+        self.view(slot, img.shape, img.dtype)[...] = img
+        return slot
+    
+    def liberar(self, slot):
+        """Devolve o slot para a lista de livres"""
+        self._livres.put(slot)
+    
+    def fechar(self):
+        """Fecha o mapeamento local (e remove o bloco, se for o dono)"""
+        self._shm.close()
+        if self.dono:
+            self._shm.unlink()
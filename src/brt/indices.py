@@ -0,0 +1,62 @@
+"""
+Índices e Consultas - Detecções no MongoDB
+Sistema BRT Recife
+
+As consultas quentes do servidor ficam aqui junto com os índices que as
+atendem, para o test_indices.py verificar (via explain) que continuam
+usando índice (IXSCAN) e não varrendo a collection (COLLSCAN):
+
+- /previsoes/<parada> (carga do quadro): {parada_destino, status}
+  ordenado por previsao_chegada
+- chegada: {deteccao_id}
+
+A posição na fila sai do quadro de chegadas em memória (QuadroChegadas.contar).
+"""
+from pymongo import ASCENDING
+
+INDICES_DETECCOES = [
+    (
+        [("parada_destino", ASCENDING), ("status", ASCENDING), ("previsao_chegada", ASCENDING)],
+        {"name": "parada_status_previsao"}
+    ),
+    (
+        [("deteccao_id", ASCENDING)],
+        {"name": "deteccao_id"}
+    ),
+]
+
+
+def garantir_indices_deteccoes(colecao, ttl_s=None):
+    """
+    Cria os índices das detecções (create_index é idempotente)
+    
+    Args:
+        colecao: collection das detecções
+        ttl_s: validade das detecções em segundos (índice TTL em
+            hora_deteccao; None = sem TTL)
+    """
+    for chaves, opcoes in INDICES_DETECCOES:
+        colecao.create_index(chaves, **opcoes)
+    
+    if ttl_s is not None:
+        colecao.create_index("hora_deteccao", name="ttl_hora_deteccao", expireAfterSeconds=ttl_s)
+
+
+CAMPOS_PREVISAO = {"_id": 0, "deteccao_id": 1, "linha": 1, "nome_linha": 1, "previsao_chegada": 1}
+
+
+def consulta_previsoes(colecao, parada_id, desde=None):
+    """
+    Cursor das detecções em rota para uma parada, por previsão de chegada
+    
+    Args:
+        colecao: collection das detecções
+        parada_id: parada de destino
+        desde: previsões anteriores a este datetime ficam de fora (filtro
+            no banco, pelo mesmo índice da ordenação)
+    """
+    filtro = {"parada_destino": parada_id, "status": "em_rota"}
+    if desde is not None:
+        filtro["previsao_chegada"] = {"$gt": desde}
+    
+    return colecao.find(filtro, CAMPOS_PREVISAO).sort("previsao_chegada", ASCENDING)
@@ -0,0 +1,124 @@
+"""
+Jobs de Detecção - Resultado do upload assíncrono
+Sistema BRT Recife
+
+Com POST /upload?async=1 o frame entra na fila de inferência e a resposta
+volta na hora com um job_id. O resultado fica aqui até ser consultado em
+GET /jobs/<id> (polling) ou entregue por GET /jobs/<id>/stream (SSE).
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class Job:
+    """
+    Um frame enviado em modo assíncrono
+    
+    Attributes:
+        id (str): identificador devolvido ao cliente
+        estado (str): "pendente", "concluido" ou "erro"
+        resultado (dict): corpo da resposta da detecção (igual ao /upload síncrono)
+        codigo (int): status HTTP equivalente do resultado
+        criado_em (float): time.monotonic() da criação
+    """
+    
+    def __init__(self, id, agora):
+        self.id = id
+        self.estado = "pendente"
+        self.resultado = None
+        self.codigo = None
+        self.criado_em = agora
+        self.concluido_em = None
+        self._evento = threading.Event()
+    
+    def aguardar(self, timeout=None):
+        """Bloqueia até o job terminar; True se terminou dentro do timeout"""
+        return self._evento.wait(timeout)
+    
+    def to_dict(self):
+        """Corpo do GET /jobs/<id>"""
+        info = {"job_id": self.id, "estado": self.estado}
+        if self.estado != "pendente":
+            info["codigo"] = self.codigo
+            info["resultado"] = self.resultado
+        return info
+
+
+class RegistroJobs:
+    """
+    Jobs em memória, com limite de quantidade e validade após concluídos
+    
+    Attributes:
+        max_jobs (int): máximo de jobs guardados (os mais antigos saem)
+        ttl_s (float): por quanto tempo um job concluído pode ser consultado
+    
+    Example:
+        >>> jobs = RegistroJobs()
+        >>> job = jobs.criar()
+        >>> future.add_done_callback(lambda f: jobs.concluir(job.id, {"linha": f.result()}))
+        >>> jobs.obter(job.id).aguardar(timeout=30)
+    """
+    
+    def __init__(self, max_jobs=1000, ttl_s=300):
+        self.max_jobs = max_jobs
+        self.ttl_s = ttl_s
+        self._jobs = OrderedDict()  # id -> Job (ordem de criação)
+        self._lock = threading.Lock()
+    
+    def _expirar(self, agora):
+        """Remove jobs concluídos há mais de ttl_s e o excesso (mais antigos)"""
+        for id in [
+            id for id, job in self._jobs.items()
+            if job.concluido_em is not None and agora - job.concluido_em > self.ttl_s
+        ]:
+            del self._jobs[id]
+        
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+    
+    def criar(self):
+        """Registra um job pendente"""
+        agora = time.monotonic()
+        job = Job(uuid.uuid4().hex, agora)
+        
+        with self._lock:
+            self._jobs[job.id] = job
+            self._expirar(agora)
+        
+        return job
+    
+    def concluir(self, id, resultado, codigo=200, erro=False):
+        """
+        Guarda o resultado e acorda quem espera o job (polling longo/SSE)
+        
+        Args:
+            id: job_id
+            resultado: corpo da resposta da detecção
+            codigo: status HTTP equivalente
+            erro: True se a detecção falhou
+        """
+        with self._lock:
+            job = self._jobs.get(id)
+            if job is None:
+                return
+            
+            job.resultado = resultado
+            job.codigo = codigo
+            job.estado = "erro" if erro else "concluido"
+            job.concluido_em = time.monotonic()
+        
+        job._evento.set()
+    
+    def obter(self, id):
+        """Job pelo id (None se não existe ou já expirou)"""
+        with self._lock:
+            self._expirar(time.monotonic())
+            return self._jobs.get(id)
+    
+    def stats(self):
+        """Contadores para o /stats"""
+        with self._lock:
+            pendentes = sum(1 for job in self._jobs.values() if job.estado == "pendente")
+            return {"pendentes": pendentes, "total": len(self._jobs)}
@@ -0,0 +1,126 @@
+"""
+Letreiro - Recorte e pré-processamento do letreiro dos ônibus
+Funções compartilhadas entre server.py e BusDetector
+"""
+import cv2
+
+
+def recortar_letreiro(img, xyxy):
+    """
+    Recorta a região do letreiro (parte superior da bounding box do ônibus)
+    
+    Args:
+        img: imagem numpy array (BGR)
+        xyxy: coordenadas (x1, y1, x2, y2) da bounding box do YOLO
+    
+    Returns:
+        numpy array (BGR) ou None se o recorte estiver vazio
+    """
+    x1, y1, x2, y2 = map(int, xyxy)
+    onibus_crop = img[y1:y2, x1:x2]
+    
+    if onibus_crop.size == 0:
+        return None
+    
+    # Focar na parte superior do ônibus (letreiro)
+    altura = onibus_crop.shape[0]
+    return onibus_crop[0:int(altura*0.35), :]
+
+
+def preprocessar_letreiro(letreiro_crop):
+    """
+    Pré-processamento para melhorar OCR (cinza + CLAHE + threshold adaptativo)
+    
+    Returns:
+        numpy array binarizado (uint8)
+    """
+    gray = cv2.cvtColor(letreiro_crop, cv2.COLOR_BGR2GRAY)
+    
+    # Aumentar contraste
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    enhanced = clahe.apply(gray)
+    
+    # Threshold adaptativo
+    return cv2.adaptiveThreshold(
+        enhanced, 255,
+        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY,
+        11, 2
+    )
+
+
+def buscar_linha_valida(ocr_results, linhas_validas, conf_min=0.4):
+    """
+    Procura uma linha válida no resultado do EasyOCR
+    
+    Args:
+        ocr_results: lista [(bbox, text, conf), ...] do reader.readtext
+        linhas_validas: coleção com os números das linhas conhecidas
+        conf_min: confiança mínima do OCR
+    
+    Returns:
+        str ou None: número da linha encontrada
+    """
+    for (bbox, text, conf_ocr) in ocr_results:
+        # Extrair apenas números do texto
+        numeros = ''.join(filter(str.isdigit, text))
+        
+        print(f"   OCR leu: '{text}' → '{numeros}' (conf: {conf_ocr:.2f})")
+        
+        # Verificar se é uma linha conhecida
+        if numeros in linhas_validas and conf_ocr > conf_min:
+            print(f"✅ LINHA {numeros} IDENTIFICADA!")
+            return numeros
+    
+    return None
+
+
+def leituras_validas(ocr_results, linhas_validas, conf_min=0.1):
+    """
+    Todas as leituras do EasyOCR que correspondem a linhas conhecidas
+    
+    Diferente de buscar_linha_valida, não para na primeira: as leituras
+    viram votos ponderados pela confiança (ver Trilha.votar).
+    
+    Args:
+        ocr_results: lista [(bbox, text, conf), ...] do reader.readtext
+        linhas_validas: coleção com os números das linhas conhecidas
+        conf_min: confiança mínima para a leitura contar
+    
+    Returns:
+        list: [(linha, conf), ...] na ordem do OCR
+    """
+    leituras = []
+    for (bbox, text, conf_ocr) in ocr_results:
+        numeros = ''.join(filter(str.isdigit, text))
+        
+        print(f"   OCR leu: '{text}' → '{numeros}' (conf: {conf_ocr:.2f})")
+        
+        if numeros in linhas_validas and conf_ocr > conf_min:
+            leituras.append((numeros, float(conf_ocr)))
+    
+    return leituras
+
+
+def empilhar_letreiros(letreiros):
+    """
+    Completa os letreiros com borda branca até o mesmo tamanho,
+    para que o EasyOCR processe todos em uma única passada
+    (readtext_batched exige imagens do mesmo tamanho)
+    
+    Args:
+        letreiros: lista de imagens binarizadas (tamanhos diferentes)
+    
+    Returns:
+        list: imagens com o mesmo shape, na mesma ordem
+    """
+    altura = max(l.shape[0] for l in letreiros)
+    largura = max(l.shape[1] for l in letreiros)
+    
+    return [
+        cv2.copyMakeBorder(
+            l, 0, altura - l.shape[0], 0, largura - l.shape[1],
+            cv2.BORDER_CONSTANT, value=255
+        )
+        for l in letreiros
+    ]
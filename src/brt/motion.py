@@ -0,0 +1,80 @@
+"""
+Filtro de Movimento - Descarta frames de cena parada antes do YOLO
+Sistema BRT Recife
+
+Compara uma versão reduzida e suavizada do frame com a última cena
+processada daquela câmera. Se quase nenhum pixel mudou, não há ônibus novo
+para detectar e a inferência pode ser pulada.
+"""
+import threading
+
+import cv2
+
+
+class FiltroMovimento:
+    """
+    Detector de mudança de cena por diferença de frames, por câmera
+    
+    A referência só é atualizada quando a cena muda, então uma mudança lenta
+    (ônibus se aproximando devagar) também é percebida ao se acumular.
+    mudou() só consulta; quem chama confirma com confirmar() depois que o
+    frame foi de fato aceito (fila cheia, modelos aquecendo etc. não podem
+    virar referência, senão a cena nova nunca chega à detecção).
+    
+    Attributes:
+        largura (int): largura do frame reduzido usado na comparação
+        limiar_pixel (int): diferença de cinza para um pixel contar como mudado
+        fracao_min (float): fração mínima de pixels mudados para a cena mudar
+    
+    Example:
+        >>> filtro = FiltroMovimento(fracao_min=0.01)
+        >>> if filtro.mudou("camera_A", frame) and enviar(frame):
+        ...     filtro.confirmar("camera_A", frame)
+    """
+    
+    def __init__(self, largura=64, limiar_pixel=25, fracao_min=0.01):
+        self.largura = largura
+        self.limiar_pixel = limiar_pixel
+        self.fracao_min = fracao_min
+        self._referencias = {}  # camera_id -> frame reduzido
+        self._lock = threading.Lock()
+    
+    def _reduzir(self, img):
+        """Frame em cinza, reduzido e suavizado (barato de comparar)"""
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        
+        altura = max(1, int(img.shape[0] * self.largura / img.shape[1]))
+        reduzido = cv2.resize(img, (self.largura, altura), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(reduzido, (3, 3), 0)
+    
+    def mudou(self, camera_id, img):
+        """
+        Verifica se a cena da câmera mudou desde o último frame processado
+        (não altera a referência; ver confirmar)
+        
+        Args:
+            camera_id: identificador da câmera
+            img: frame numpy array (BGR ou cinza)
+        
+        Returns:
+            bool: True se o frame deve seguir para a detecção
+        """
+        reduzido = self._reduzir(img)
+        
+        with self._lock:
+            referencia = self._referencias.get(camera_id)
+        
+        if referencia is None or referencia.shape != reduzido.shape:
+            return True
+        
+        diff = cv2.absdiff(reduzido, referencia)
+        fracao = cv2.countNonZero((diff > self.limiar_pixel).astype("uint8")) / diff.size
+        return fracao >= self.fracao_min
+    
+    def confirmar(self, camera_id, img):
+        """Frame aceito para a detecção: passa a ser a referência da câmera"""
+        reduzido = self._reduzir(img)
+        
+        with self._lock:
+            self._referencias[camera_id] = reduzido
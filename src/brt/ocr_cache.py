@@ -0,0 +1,194 @@
+"""
+Cache de OCR - Resultado do letreiro por hash perceptual (dHash)
+Sistema BRT Recife
+
+Um ônibus parado em frente à câmera gera dezenas de frames quase iguais.
+A região dos dígitos do letreiro vira um dHash; recortes da mesma câmera
+com hash igual ou quase igual (poucos bits de diferença) reaproveitam a
+linha já lida, sem rodar o EasyOCR.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def dhash(img, largura=16, altura=16, margem=8):
+    """
+    Hash perceptual por diferença (dHash) de uma imagem, com máscara
+    
+    Reduz para (largura+1) x altura em tons de cinza e compara cada pixel
+    com o vizinho da direita: um bit por comparação. Diferenças menores que
+    a margem (fundo liso, borda suave do dígito) ficam fora da máscara: o
+    ruído do sensor troca esses bits de um frame para o outro, então eles
+    não contam na distância (ver distancia).
+    
+    Args:
+        img: imagem numpy array (BGR ou cinza)
+        largura, altura: dimensões do hash (16 x 16 → 256 bits)
+        margem: diferença mínima de cinza para o bit ser confiável
+    
+    Returns:
+        tuple: (bits, mascara) como inteiros de largura*altura bits
+    """
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    
+    reduzida = cv2.resize(img, (largura + 1, altura), interpolation=cv2.INTER_AREA)
+    reduzida = reduzida.astype(np.int16)
+    diferencas = reduzida[:, 1:] - reduzida[:, :-1]
+    
+    def empacotar(bits):
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+    
+    return empacotar(diferencas > 0), empacotar(np.abs(diferencas) > margem)
+
+
+def distancia(a, b):
+    """Bits que os dois hashes marcam como confiáveis e discordam"""
+    return bin((a[0] ^ b[0]) & a[1] & b[1]).count("1")
+
+
+def caixa_digitos(gray):
+    """
+    Caixa (x, y, w, h) dos dígitos do letreiro, ou None se não há tinta
+    
+    Binariza (Otsu, LED claro ou impresso escuro) e junta só os componentes
+    altos, comparáveis ao maior: o destino em letra pequena e pontos de
+    ruído ficam de fora, então a caixa não muda de um frame para o outro.
+    """
+    _, binaria = cv2.threshold(cv2.GaussianBlur(gray, (5, 5), 0), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if binaria.mean() > 127:
+        binaria = 255 - binaria
+    
+    n, _, stats, _ = cv2.connectedComponentsWithStats(binaria, connectivity=8)
+    if n <= 1:
+        return None
+    
+    alturas = stats[1:, cv2.CC_STAT_HEIGHT]
+    altos = stats[1:][alturas >= 0.6 * alturas.max()]
+    
+    x1 = altos[:, cv2.CC_STAT_LEFT].min()
+    y1 = altos[:, cv2.CC_STAT_TOP].min()
+    x2 = (altos[:, cv2.CC_STAT_LEFT] + altos[:, cv2.CC_STAT_WIDTH]).max()
+    y2 = (altos[:, cv2.CC_STAT_TOP] + altos[:, cv2.CC_STAT_HEIGHT]).max()
+    return int(x1), int(y1), int(x2 - x1), int(y2 - y1)
+
+
+def hash_letreiro(letreiro_crop, largura=32, altura=12, margem=8):
+    """
+    dHash da região dos dígitos do letreiro
+    
+    Com o hash do recorte inteiro, o número ocupa poucos pixels do hash e
+    letreiros de linhas diferentes (ex: 2441 e 2444) ficam a poucos bits de
+    distância. Aqui só a caixa dos dígitos é reduzida, com mais colunas que
+    linhas (o número é largo).
+    
+    Args:
+        letreiro_crop: recorte do letreiro (BGR ou cinza)
+        largura, altura, margem: repassados ao dhash
+    
+    Returns:
+        tuple: (bits, mascara) do dhash
+    """
+    gray = letreiro_crop
+    if gray.ndim == 3:
+        gray = cv2.cvtColor(gray, cv2.COLOR_BGR2GRAY)
+    
+    caixa = caixa_digitos(gray)
+    if caixa is not None:
+        x, y, w, h = caixa
+        gray = gray[y:y + h, x:x + w]
+    
+    return dhash(gray, largura, altura, margem)
+
+
+class CacheOCR:
+    """
+    Cache LRU com TTL do resultado do OCR de cada letreiro
+    
+    O resultado pode ser a linha lida (BusDetector) ou a lista de leituras
+    [(linha, conf), ...] usada na votação (server.py). Letreiros sem linha
+    válida também são guardados, para não repetir OCR em frames parados de
+    um letreiro ilegível.
+    
+    As entradas são separadas por câmera: um letreiro só reaproveita leitura
+    de outro visto pela mesma câmera, nunca de outra parada.
+    
+    Attributes:
+        max_itens (int): máximo de letreiros guardados (LRU)
+        ttl_s (float): validade de cada entrada em segundos
+        distancia_max (int): distância máxima (bits confiáveis diferentes)
+            para considerar dois letreiros iguais (0 = só hash idêntico)
+        hits (int): consultas respondidas pelo cache
+        misses (int): consultas que precisaram de OCR
+    
+    Example:
+        >>> cache = CacheOCR(max_itens=256, ttl_s=120)
+        >>> chave = hash_letreiro(letreiro_crop)
+        >>> encontrado, linha = cache.obter(chave, camera_id)
+        >>> if not encontrado:
+        ...     linha = rodar_ocr(letreiro_crop)
+        ...     cache.guardar(chave, linha, camera_id)
+    """
+    
+    def __init__(self, max_itens=256, ttl_s=120, distancia_max=2):
+        self.max_itens = max_itens
+        self.ttl_s = ttl_s
+        self.distancia_max = distancia_max
+        self.hits = 0
+        self.misses = 0
+        self._itens = OrderedDict()  # (camera_id, hash) -> (resultado, expira_em)
+        self._lock = threading.Lock()
+    
+    def obter(self, chave, camera_id=None):
+        """
+        Procura um letreiro igual ou parecido visto pela mesma câmera
+        
+        Returns:
+            tuple: (encontrado, resultado) - resultado pode ser vazio mesmo
+                com encontrado=True (letreiro já lido sem linha válida)
+        """
+        agora = time.monotonic()
+        
+        with self._lock:
+            achada = (camera_id, chave) if (camera_id, chave) in self._itens else None
+            
+            if achada is None and self.distancia_max > 0:
+                for outra in self._itens:
+                    if outra[0] == camera_id and distancia(chave, outra[1]) <= self.distancia_max:
+                        achada = outra
+                        break
+            
+            if achada is not None:
+                resultado, expira_em = self._itens[achada]
+                if expira_em > agora:
+                    self._itens.move_to_end(achada)
+                    self.hits += 1
+                    return True, resultado
+                del self._itens[achada]
+            
+            self.misses += 1
+            return False, None
+    
+    def guardar(self, chave, resultado, camera_id=None):
+        """Guarda o resultado do OCR (mesmo vazio) para o letreiro da câmera"""
+        with self._lock:
+            self._itens[(camera_id, chave)] = (resultado, time.monotonic() + self.ttl_s)
+            self._itens.move_to_end((camera_id, chave))
+            
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+    
+    def stats(self):
+        """Contadores para o /stats"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "itens": len(self._itens)
+            }
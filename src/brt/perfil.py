@@ -0,0 +1,70 @@
+"""
+Perfil de Detecção - Configuração do YOLO para achar só ônibus
+Sistema BRT Recife
+
+O yolov8n detecta as 80 classes do COCO, mas só "bus" interessa. O perfil
+filtra a classe já na inferência, permite um imgsz menor e recorta uma
+região de interesse (ROI) por câmera, o que reduz a latência em CPU.
+"""
+
+
+class PerfilDeteccao:
+    """
+    Parâmetros de inferência do YOLO usados por server.py e BusDetector
+    
+    Attributes:
+        somente_onibus (bool): filtra a classe "bus" dentro do YOLO
+        imgsz (int): lado da imagem de entrada do YOLO (múltiplo de 32)
+        conf (float): confiança mínima das caixas
+        rois (dict): camera_id -> (x1, y1, x2, y2) da região de interesse
+    
+    Example:
+        >>> perfil = PerfilDeteccao(imgsz=480, rois={"camera_A": (0, 100, 1280, 620)})
+        >>> img_roi = perfil.recortar_roi(img, "camera_A")
+        >>> results = model(img_roi, **perfil.kwargs_yolo())
+    """
+    
+    CLASSE_ONIBUS = 5  # "bus" no COCO
+    
+    def __init__(self, somente_onibus=True, imgsz=640, conf=0.5, rois=None):
+        self.somente_onibus = somente_onibus
+        self.imgsz = imgsz
+        self.conf = conf
+        self.rois = rois or {}
+    
+    def kwargs_yolo(self):
+        """Argumentos da chamada model(img, ...)"""
+        kwargs = {"conf": self.conf, "imgsz": self.imgsz}
+        if self.somente_onibus:
+            kwargs["classes"] = [self.CLASSE_ONIBUS]
+        return kwargs
+    
+    def recortar_roi(self, img, camera_id):
+        """
+        Recorta a região de interesse da câmera (view, sem cópia)
+        
+        Returns:
+            numpy array: ROI da câmera, ou a imagem inteira se não houver ROI
+        """
+        roi = self.rois.get(camera_id)
+        if roi is None:
+            return img
+        
+        altura, largura = img.shape[:2]
+        x1, y1, x2, y2 = roi
+        x1, x2 = max(0, x1), min(largura, x2)
+        y1, y2 = max(0, y1), min(altura, y2)
+        
+        if x2 <= x1 or y2 <= y1:
+            return img
+        
+        return img[y1:y2, x1:x2]
+    
+    def to_dict(self):
+        """Resumo do perfil para o /health"""
+        return {
+            "somente_onibus": self.somente_onibus,
+            "imgsz": self.imgsz,
+            "conf": self.conf,
+            "rois": {camera: list(roi) for camera, roi in self.rois.items()}
+        }
@@ -0,0 +1,77 @@
+"""
+Tarefa Periódica - Manutenção em segundo plano
+Sistema BRT Recife
+
+Trabalho que não precisa estar no caminho da requisição (expirar
+detecções, reconciliar contadores...) roda numa thread a cada intervalo.
+Uma falha é registrada e a tarefa tenta de novo no próximo ciclo.
+"""
+import threading
+
+
+class TarefaPeriodica:
+    """
+    Executa uma função a cada intervalo_s segundos numa thread daemon
+    
+    Attributes:
+        nome (str): nome da tarefa (thread e logs)
+        intervalo_s (float): tempo entre o fim de uma execução e a próxima
+        funcao (callable): função sem argumentos
+        preparar (callable): executada uma vez antes da primeira execução
+            (ex: criar índices); repetida a cada ciclo até dar certo
+        execucoes (int): execuções concluídas
+        falhas (int): execuções que levantaram exceção
+    
+    Example:
+        >>> reaper = TarefaPeriodica("expirar", 60, expirar_deteccoes)
+        >>> reaper.iniciar()
+    """
+    
+    def __init__(self, nome, intervalo_s, funcao, preparar=None, executar_ao_iniciar=True):
+        self.nome = nome
+        self.intervalo_s = intervalo_s
+        self.funcao = funcao
+        self.preparar = preparar
+        self.executar_ao_iniciar = executar_ao_iniciar
+        self.execucoes = 0
+        self.falhas = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"tarefa-{nome}", daemon=True)
+    
+    def iniciar(self):
+        self._thread.start()
+        return self
+    
+    def parar(self, timeout=5):
+        self._parar.set()
+        self._thread.join(timeout)
+    
+    def executar(self):
+        """Uma execução da tarefa (também usada fora da thread, ex: no shutdown)"""
+        try:
+            self.funcao()
+            self.execucoes += 1
+        except Exception as e:
+            self.falhas += 1
+            print(f"⚠️  Tarefa {self.nome} falhou: {e}")
+    
+    def _loop(self):
+        preparado = self.preparar is None
+        primeira = True
+        
+        while not self._parar.is_set():
+            # preparar roda logo ao iniciar, mesmo sem executar_ao_iniciar
+            if not preparado:
+                try:
+                    self.preparar()
+                    preparado = True
+                except Exception as e:
+                    print(f"⚠️  Preparação da tarefa {self.nome} falhou: {e}")
+            
+            if preparado and (self.executar_ao_iniciar or not primeira):
+                self.executar()
+            primeira = False
+            self._parar.wait(self.intervalo_s)
+    
+    def stats(self):
+        return {"execucoes": self.execucoes, "falhas": self.falhas}
@@ -0,0 +1,285 @@
+"""
+Pool de Detecção - Processos dedicados com YOLO + EasyOCR
+Sistema BRT Recife
+
+Cada worker é um processo de longa duração com seu próprio BusDetector.
+Os frames decodificados vão para os workers por um anel de memória
+compartilhada (FrameRing): o processo web escreve o frame uma vez e o
+worker lê no lugar, sem pickle e sem cópia. O servidor web só faz parsing
+e despacho.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from .scheduler import FilaCheiaError
+from .frame_ring import FrameRing
+
+
+# Estado do processo worker (um de cada por processo)
+_detector = None
+_ring = None
+_contadores_cache = None    # [hits, misses] de todos os workers (memória compartilhada)
+_publicados = (0, 0)        # hits/misses deste worker já somados em _contadores_cache
+
+
+def _iniciar_worker(linhas_validas, opcoes_detector, nome_ring, num_slots, bytes_por_slot,
+                    contadores_cache):
+    """Initializer do processo: carrega e aquece YOLO + EasyOCR e anexa o anel de frames"""
+    global _detector, _ring, _contadores_cache
+    from .detector import BusDetector
+    _detector = BusDetector(linhas_validas, **opcoes_detector)
+    _detector.aquecer()
+    _ring = FrameRing.anexar(nome_ring, num_slots, bytes_por_slot)
+    _contadores_cache = contadores_cache
+
+
+def _publicar_cache():
+    """Soma nos contadores compartilhados os hits/misses do cache de OCR deste worker"""
+    global _publicados
+    atual = (_detector.cache_ocr.hits, _detector.cache_ocr.misses)
+    with _contadores_cache.get_lock():
+        _contadores_cache[0] += atual[0] - _publicados[0]
+        _contadores_cache[1] += atual[1] - _publicados[1]
+    _publicados = atual
+
+
+def _ping():
+    """Tarefa vazia usada para subir os processos (e saber quando aqueceram)"""
+    return True
+
+
+def _detectar_slot(slot, shape, dtype, camera_id):
+    """Executa no worker: detecta a linha direto no slot do anel (sem cópia)"""
+    try:
+        return _detector.detectar_linha(_ring.view(slot, shape, dtype), camera_id)
+    finally:
+        _publicar_cache()
+
+
+def _detectar_shm(nome, shape, dtype, camera_id):
+    """Executa no worker: frame maior que o slot, em bloco de memória próprio"""
+    shm = shared_memory.SharedMemory(name=nome)
+    try:
+        img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        linha = _detector.detectar_linha(img, camera_id)
+        del img
+        return linha
+    finally:
+        _publicar_cache()
+        try:
+            shm.close()
+        except BufferError:
+            # O YOLO ainda guarda referência ao último frame; o mapeamento
+            # é liberado quando essa referência for descartada
+            pass
+
+
+class DetectorPool:
+    """
+    Pool de processos de detecção
+    
+    Mesma interface do InferenceScheduler: submit(img, camera_id) devolve
+    um Future e falha com FilaCheiaError quando há frames demais em
+    andamento. camera_id só seleciona a ROI do perfil; não há rastreamento
+    por câmera, pois frames da mesma câmera caem em processos diferentes.
+    
+    Attributes:
+        num_workers (int): quantidade de processos
+        max_fila (int): máximo de frames em andamento (na fila + processando)
+        ring (FrameRing): anel com um slot por frame em andamento
+    
+    Example:
+        >>> pool = DetectorPool(["437", "2441"], num_workers=4)
+        >>> linha = pool.submit(img).result(timeout=30)
+    """
+    
+    def __init__(self, linhas_validas, num_workers, max_fila=32, bytes_por_slot=1280 * 720 * 3,
+                 opcoes_detector=None):
+        """
+        Args:
+            linhas_validas: lista de linhas válidas (ex: ["437", "2441", ...])
+            num_workers: quantidade de processos (normalmente = núcleos)
+            max_fila: máximo de frames em andamento antes do HTTP 429
+            bytes_por_slot: tamanho de um slot do anel (default: 720p BGR)
+            opcoes_detector: kwargs extras do BusDetector (ex: backend)
+        """
+        self.num_workers = num_workers
+        self.max_fila = max_fila
+        self._em_andamento = 0
+        self._lock = threading.Lock()
+        
+        # Os workers precisam herdar o resource_tracker do processo web;
+        # sem isso cada um sobe o seu e remove os frames ao terminar
+        resource_tracker.ensure_running()
+        self.ring = FrameRing(max_fila, bytes_por_slot)
+        
+        # Cada worker tem seu cache de OCR; hits/misses somados aqui para o /stats
+        contexto = multiprocessing.get_context("fork")
+        self._contadores_cache = contexto.Array("q", 2)
+        
+        # fork: os workers herdam o processo web sem reimportar o módulo
+        # principal (com spawn o server.py inteiro rodaria de novo em cada worker).
+        # Por isso o pool tem que ser criado antes de qualquer thread (cliente
+        # do MongoDB, escritores em lote...): o filho herda locks que outra
+        # thread podia estar segurando no momento do fork e pode travar
+        if threading.active_count() > 1:
+            print(f"⚠️  DetectorPool criado com {threading.active_count() - 1} threads extras; "
+                  "crie o pool antes de abrir conexões/threads")
+        
+        self._executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=contexto,
+            initializer=_iniciar_worker,
+            initargs=(
+                list(linhas_validas),
+                opcoes_detector or {},
+                self.ring.nome,
+                self.ring.num_slots,
+                self.ring.bytes_por_slot,
+                self._contadores_cache
+            )
+        )
+        
+        # Com fork, o primeiro submit cria todos os processos de uma vez (antes
+        # da thread de gerência do executor); o ping termina quando um worker
+        # já carregou e aqueceu os modelos
+        self._aquecimento = self._executor.submit(_ping)
+        print(f"✅ DetectorPool iniciado ({num_workers} processos, {max_fila} slots de {bytes_por_slot // 1024} KB)")
+    
+    def submit(self, img, camera_id=None):
+        """
+        Escreve o frame num slot do anel e despacha para um worker
+        
+        Frames maiores que o slot usam um bloco de memória próprio.
+        
+        Returns:
+            Future: resolvido com o número da linha (ou None)
+        
+        Raises:
+            FilaCheiaError: se já houver max_fila frames em andamento
+        """
+        self._reservar(1)
+        return self._despachar(img, camera_id)
+    
+    def submit_lote(self, imgs, camera_id=None):
+        """
+        Despacha vários frames de uma vez: todos ou nenhum
+        
+        Returns:
+            list: um Future por frame, na mesma ordem
+        
+        Raises:
+            FilaCheiaError: se não há espaço para todos (nenhum é despachado)
+        """
+        self._reservar(len(imgs))
+        
+        futures = []
+        try:
+            for img in imgs:
+                futures.append(self._despachar(img, camera_id))
+        except Exception:
+            # _despachar já devolveu a vaga do frame que falhou; devolve as dos seguintes
+            for _ in range(len(imgs) - len(futures) - 1):
+                self._finalizar()
+            raise
+        
+        return futures
+    
+    def _reservar(self, n):
+        """Reserva n vagas entre os frames em andamento"""
+        with self._lock:
+            if self._em_andamento + n > self.max_fila:
+                raise FilaCheiaError(f"Pool de detecção cheio ({self.max_fila} frames)")
+            self._em_andamento += n
+    
+    def _despachar(self, img, camera_id):
+        """Envia um frame (com vaga já reservada) para um worker"""
+        if not self.ring.cabe(img):
+            return self._submit_shm(img, camera_id)
+        
+        slot = None
+        try:
+            slot = self.ring.escrever(img)
+            future = self._executor.submit(_detectar_slot, slot, img.shape, img.dtype.str, camera_id)
+        except Exception:
+            if slot is not None:
+                self.ring.liberar(slot)
+            self._finalizar()
+            raise
+        
+        future.add_done_callback(lambda _: self._liberar_slot(slot))
+        return future
+    
+    def _submit_shm(self, img, camera_id):
+        """Despacha um frame grande demais para o anel (bloco próprio)"""
+        shm = None
+        try:
+            shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+            np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[:] = img
+            
+            future = self._executor.submit(_detectar_shm, shm.name, img.shape, img.dtype.str, camera_id)
+        except Exception:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self._finalizar()
+            raise
+        
+        future.add_done_callback(lambda _: self._liberar(shm))
+        return future
+    
+    def pronto(self):
+        """True quando ao menos um worker já está com os modelos aquecidos"""
+        return self._aquecimento.done() and self._aquecimento.exception() is None
+    
+    def to_dict(self):
+        """Estado do aquecimento para o /health (mesmo formato do CarregadorModelos)"""
+        if not self._aquecimento.done():
+            return {"estado": "aquecendo"}
+        
+        # Initializer que falhou (modelo ausente, falta de memória...) quebra o pool
+        erro = self._aquecimento.exception()
+        if erro is not None:
+            return {"estado": "erro", "erro": str(erro) or type(erro).__name__}
+        
+        return {"estado": "pronto"}
+    
+    def stats_cache_ocr(self):
+        """Hits/misses do cache de OCR somados de todos os workers (mesmo formato do CacheOCR)"""
+        with self._contadores_cache.get_lock():
+            hits, misses = self._contadores_cache[:]
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+            "workers": self.num_workers
+        }
+    
+    def tamanho_fila(self):
+        """Quantidade de frames em andamento"""
+        return self._em_andamento
+    
+    def _liberar_slot(self, slot):
+        """Devolve o slot do anel quando o worker termina"""
+        self.ring.liberar(slot)
+        self._finalizar()
+    
+    def _liberar(self, shm):
+        """Remove o bloco de memória do frame quando o worker termina"""
+        shm.close()
+        shm.unlink()
+        self._finalizar()
+    
+    def _finalizar(self):
+        with self._lock:
+            self._em_andamento -= 1
+    
+    def encerrar(self):
+        """Encerra os processos (aguarda os frames em andamento)"""
+        self._executor.shutdown(wait=True)
+        self.ring.fechar()
@@ -0,0 +1,236 @@
+"""
+Quadro de Chegadas - Cache em memória das previsões por parada
+Sistema BRT Recife
+
+Os displays das paradas consultam GET /previsoes/<parada> o tempo todo.
+Aqui cada parada guarda a lista de detecções em rota já ordenada pela
+previsão de chegada: novas detecções entram por inserção ordenada
+(bisect) quando são registradas, e a leitura só descarta as vencidas e
+recalcula os minutos. O banco só é consultado na primeira leitura da
+parada e a cada ttl_s segundos (pega alterações feitas por outros
+processos, ex: vários workers do gunicorn, cada um com seu cache).
+
+Cada parada tem uma versão, incrementada quando uma detecção entra ou sai
+do quadro; os streams SSE dos displays esperam a versão mudar em vez de
+consultar de novo. O mesmo quadro dá a posição na fila de uma detecção
+recém-registrada (contar), sem outra consulta ao banco.
+"""
+import bisect
+import threading
+import time
+
+
+def entrada_quadro(det):
+    """Documento de detecção -> item do quadro (ordenável pela previsão)"""
+    return (
+        det["previsao_chegada"],
+        det["deteccao_id"],
+        {
+            "deteccao_id": det["deteccao_id"],
+            "linha": det["linha"],
+            "nome": det["nome_linha"],
+            "previsao_hora": det["previsao_chegada"].strftime("%H:%M")
+        }
+    )
+
+
+class QuadroChegadas:
+    """
+    Previsões em rota por parada, ordenadas pela chegada
+    
+    Attributes:
+        carregar (callable): parada_id -> detecções em rota da parada
+            (documentos com previsao_chegada datetime)
+        ttl_s (float): idade máxima do quadro antes de recarregar do banco
+        limite_atraso (timedelta): previsões vencidas há mais que isso saem
+        leituras (int): leituras atendidas pelo cache
+        cargas (int): leituras que foram ao banco
+    
+    Example:
+        >>> quadro = QuadroChegadas(carregar_quadro, ttl_s=30)
+        >>> quadro.adicionar("B", deteccao)
+        >>> quadro.obter("B", datetime.now(timezone.utc))
+    """
+    
+    def __init__(self, carregar, ttl_s=30, limite_atraso=None):
+        self.carregar = carregar
+        self.ttl_s = ttl_s
+        self.limite_atraso = limite_atraso
+        self.leituras = 0
+        self.cargas = 0
+        
+        self._paradas = {}      # parada -> (carregado_em, [entradas ordenadas])
+        self._ids = {}          # parada -> {deteccao_id: entrada} (uma por detecção)
+        self._carregando = {}   # parada -> detecções registradas durante a carga
+        self._versoes = {}      # parada -> contador de mudanças
+        self._lock = threading.Lock()
+        self._mudou = threading.Condition(self._lock)
+    
+    def _marcar_mudanca(self, parada_id):
+        """Incrementa a versão da parada e acorda quem espera (com o lock)"""
+        self._versoes[parada_id] = self._versoes.get(parada_id, 0) + 1
+        self._mudou.notify_all()
+    
+    def _recarregar(self, parada_id):
+        """Consulta o banco e junta o que foi registrado durante a consulta"""
+        with self._lock:
+            self._carregando.setdefault(parada_id, [])
+        
+        try:
+            docs = list(self.carregar(parada_id))
+        finally:
+            with self._lock:
+                durante = self._carregando.pop(parada_id, [])
+        
+        por_id = {}
+        for det in docs + durante:
+            por_id.setdefault(det["deteccao_id"], entrada_quadro(det))
+        
+        entradas = sorted(por_id.values())
+        
+        with self._lock:
+            anterior = self._paradas.get(parada_id)
+            self._paradas[parada_id] = (time.monotonic(), entradas)
+            self._ids[parada_id] = por_id
+            self.cargas += 1
+            
+            # Recarga trouxe algo diferente (ex: registrado por outro processo)
+            if anterior is not None and [e[:2] for e in anterior[1]] != [e[:2] for e in entradas]:
+                self._marcar_mudanca(parada_id)
+    
+    def obter(self, parada_id, agora):
+        """
+        Previsões em rota da parada, da mais próxima para a mais distante
+        
+        Args:
+            parada_id: parada de destino
+            agora: datetime atual (com fuso)
+        
+        Returns:
+            list: (previsao_chegada, dados) para montar a resposta
+        """
+        self._garantir_carregado(parada_id)
+        
+        with self._lock:
+            entradas = self._ativas(parada_id, agora)
+            self.leituras += 1
+            return [(previsao, dados) for previsao, _, dados in entradas]
+    
+    def contar(self, parada_id, agora):
+        """
+        Quantas detecções estão em rota para a parada (posição na fila de
+        quem acabou de ser registrado), sem montar a lista
+        """
+        self._garantir_carregado(parada_id)
+        
+        with self._lock:
+            return len(self._ativas(parada_id, agora))
+    
+    def _garantir_carregado(self, parada_id):
+        """Carrega do banco na primeira vez e quando o quadro passou de ttl_s"""
+        with self._lock:
+            atual = self._paradas.get(parada_id)
+        
+        if atual is None or time.monotonic() - atual[0] > self.ttl_s:
+            self._recarregar(parada_id)
+    
+    def _ativas(self, parada_id, agora):
+        """Entradas da parada sem as vencidas (chamar com o lock)"""
+        _, entradas = self._paradas.get(parada_id, (None, []))
+        
+        # Vencidas ficam no começo da lista: um bisect acha o corte
+        if self.limite_atraso is not None:
+            corte = bisect.bisect_right(entradas, (agora - self.limite_atraso,))
+            if corte:
+                ids = self._ids.get(parada_id, {})
+                for _, deteccao_id, _ in entradas[:corte]:
+                    ids.pop(deteccao_id, None)
+                del entradas[:corte]
+                self._marcar_mudanca(parada_id)
+        
+        return entradas
+    
+    def adicionar(self, parada_id, det):
+        """
+        Insere uma detecção recém-registrada no quadro da parada (se carregado)
+        
+        A mesma detecção chega de novo pelo change stream (inclusive a que
+        este processo acabou de registrar, com a previsão truncada para
+        milissegundos pelo BSON): cada deteccao_id tem uma única entrada, e
+        a nova só substitui a antiga se a previsão mudou.
+        """
+        entrada = entrada_quadro(det)
+        
+        with self._lock:
+            if parada_id in self._carregando:
+                self._carregando[parada_id].append(det)
+            
+            atual = self._paradas.get(parada_id)
+            if atual is not None:
+                entradas = atual[1]
+                ids = self._ids.setdefault(parada_id, {})
+                
+                anterior = ids.get(entrada[1])
+                if anterior is not None:
+                    if anterior[:2] == entrada[:2]:
+                        return  # já está no quadro
+                    self._tirar(entradas, anterior)
+                
+                bisect.insort(entradas, entrada)
+                ids[entrada[1]] = entrada
+            
+            self._marcar_mudanca(parada_id)
+    
+    @staticmethod
+    def _tirar(entradas, entrada):
+        """Remove uma entrada da lista ordenada (busca binária pela chave)"""
+        i = bisect.bisect_left(entradas, entrada[:2])
+        if i < len(entradas) and entradas[i][:2] == entrada[:2]:
+            del entradas[i]
+    
+    def remover(self, parada_id, deteccao_id):
+        """Tira uma detecção do quadro (chegou, expirou...)"""
+        with self._lock:
+            atual = self._paradas.get(parada_id)
+            if atual is None:
+                return
+            
+            entrada = self._ids.get(parada_id, {}).pop(deteccao_id, None)
+            if entrada is None:
+                return
+            
+            self._tirar(atual[1], entrada)
+            self._marcar_mudanca(parada_id)
+    
+    def versao(self, parada_id):
+        with self._lock:
+            return self._versoes.get(parada_id, 0)
+    
+    def aguardar_mudanca(self, parada_id, versao, timeout):
+        """
+        Bloqueia até a versão da parada ser diferente de versao
+        
+        Returns:
+            int: versão atual (igual a versao se deu timeout)
+        """
+        with self._mudou:
+            self._mudou.wait_for(lambda: self._versoes.get(parada_id, 0) != versao, timeout)
+            return self._versoes.get(parada_id, 0)
+    
+    def invalidar(self, parada_id=None):
+        """Força recarga do banco na próxima leitura (uma parada ou todas)"""
+        with self._lock:
+            paradas = list(self._paradas) if parada_id is None else [parada_id]
+            for parada in paradas:
+                self._ids.pop(parada, None)
+                if self._paradas.pop(parada, None) is not None:
+                    self._marcar_mudanca(parada)
+    
+    def stats(self):
+        """Contadores para o /stats"""
+        with self._lock:
+            return {
+                "paradas": len(self._paradas),
+                "leituras": self.leituras,
+                "cargas": self.cargas
+            }
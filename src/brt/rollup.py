@@ -0,0 +1,193 @@
+"""
+Rollup de Detecções - Agregados por minuto, hora e dia
+Sistema BRT Recife
+
+As detecções brutas somem com o índice TTL e qualquer análise histórica
+teria que varrê-las. Aqui cada detecção soma num balde (bucket) por
+granularidade, linha e par de paradas: quantidade, intervalo entre ônibus
+da mesma linha na mesma parada (headway) e tempo de viagem. Os incrementos
+ficam em memória e são gravados de tempos em tempos com um bulk_write de
+upserts $inc, então vários processos podem somar no mesmo balde.
+
+Baldes por minuto expiram em alguns dias, por hora em alguns meses; os
+diários ficam.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from pymongo import ASCENDING, UpdateOne
+
+GRANULARIDADES = {
+    "minuto": (lambda t: t.replace(second=0, microsecond=0), timedelta(days=2)),
+    "hora": (lambda t: t.replace(minute=0, second=0, microsecond=0), timedelta(days=90)),
+    "dia": (lambda t: t.replace(hour=0, minute=0, second=0, microsecond=0), None),
+}
+
+CAMPOS_SOMA = ("deteccoes", "headway_soma_s", "headway_n", "viagem_soma_min", "viagem_n")
+
+
+class AgregadorDeteccoes:
+    """
+    Acumula detecções em baldes de tempo e grava em lote no MongoDB
+    
+    Attributes:
+        colecao: collection dos baldes (ex: deteccoes_rollup)
+        headway_max_s (float): intervalos maiores que isso não contam como
+            headway (fim do serviço, câmera desligada...)
+        gravados (int): upserts gravados
+    
+    Example:
+        >>> agregador = AgregadorDeteccoes(db["deteccoes_rollup"])
+        >>> agregador.registrar("437", "A", "B", agora)
+        >>> agregador.registrar_viagem("437", "A", "B", agora, 12)
+        >>> agregador.gravar()
+    """
+    
+    def __init__(self, colecao, headway_max_s=2 * 60 * 60):
+        self.colecao = colecao
+        self.headway_max_s = headway_max_s
+        self.gravados = 0
+        
+        self._baldes = defaultdict(lambda: dict.fromkeys(CAMPOS_SOMA, 0))
+        self._ultima_passagem = {}  # (linha, parada_origem) -> datetime
+        self._lock = threading.Lock()
+    
+    def garantir_indices(self):
+        """Chave única do balde, consulta por período e expiração (TTL)"""
+        self.colecao.create_index(
+            [("granularidade", ASCENDING), ("linha", ASCENDING), ("parada_origem", ASCENDING),
+             ("parada_destino", ASCENDING), ("inicio", ASCENDING)],
+            name="balde", unique=True
+        )
+        self.colecao.create_index(
+            [("granularidade", ASCENDING), ("inicio", ASCENDING)], name="granularidade_inicio"
+        )
+        self.colecao.create_index("expira_em", name="ttl_expira_em", expireAfterSeconds=0)
+    
+    def _somar(self, linha, parada_origem, parada_destino, quando, valores):
+        """Soma valores nos baldes de todas as granularidades (com o lock)"""
+        for granularidade, (truncar, _) in GRANULARIDADES.items():
+            balde = self._baldes[(granularidade, truncar(quando), linha, parada_origem, parada_destino)]
+            for campo, valor in valores.items():
+                balde[campo] += valor
+    
+    def registrar(self, linha, parada_origem, parada_destino, quando):
+        """
+        Uma detecção
+        
+        Args:
+            linha: número da linha
+            parada_origem: parada onde o ônibus foi visto
+            parada_destino: parada de destino
+            quando: datetime da detecção (com fuso)
+        """
+        valores = {"deteccoes": 1}
+        
+        with self._lock:
+            anterior = self._ultima_passagem.get((linha, parada_origem))
+            self._ultima_passagem[(linha, parada_origem)] = quando
+            
+            if anterior is not None:
+                intervalo = (quando - anterior).total_seconds()
+                if 0 < intervalo <= self.headway_max_s:
+                    valores["headway_soma_s"] = intervalo
+                    valores["headway_n"] = 1
+            
+            self._somar(linha, parada_origem, parada_destino, quando, valores)
+    
+    def registrar_viagem(self, linha, parada_origem, parada_destino, quando, minutos):
+        """Tempo de viagem observado (chegada); soma no balde da detecção (quando)"""
+        with self._lock:
+            self._somar(linha, parada_origem, parada_destino, quando, {
+                "viagem_soma_min": minutos,
+                "viagem_n": 1
+            })
+    
+    def gravar(self):
+        """
+        Grava os incrementos acumulados (um upsert $inc por balde)
+        
+        Returns:
+            int: baldes gravados
+        """
+        with self._lock:
+            baldes, self._baldes = self._baldes, defaultdict(lambda: dict.fromkeys(CAMPOS_SOMA, 0))
+        
+        if not baldes:
+            return 0
+        
+        operacoes = []
+        for (granularidade, inicio, linha, parada_origem, parada_destino), somas in baldes.items():
+            novo = {}
+            retencao = GRANULARIDADES[granularidade][1]
+            if retencao is not None:
+                novo["expira_em"] = inicio + retencao
+            
+            operacoes.append(UpdateOne(
+                {
+                    "granularidade": granularidade,
+                    "linha": linha,
+                    "parada_origem": parada_origem,
+                    "parada_destino": parada_destino,
+                    "inicio": inicio
+                },
+                {"$inc": somas, "$setOnInsert": novo} if novo else {"$inc": somas},
+                upsert=True
+            ))
+        
+        try:
+            self.colecao.bulk_write(operacoes, ordered=False)
+        except Exception:
+            # Devolve os incrementos para a próxima tentativa
+            with self._lock:
+                for chave, somas in baldes.items():
+                    for campo, valor in somas.items():
+                        self._baldes[chave][campo] += valor
+            raise
+        
+        self.gravados += len(operacoes)
+        return len(operacoes)
+    
+    def pendentes(self):
+        with self._lock:
+            return len(self._baldes)
+
+
+def consultar_baldes(colecao, granularidade, desde, ate, linha=None, parada=None, limite=1000):
+    """
+    Baldes de uma granularidade no período, com as médias calculadas
+    
+    Args:
+        colecao: collection dos baldes
+        granularidade: "minuto", "hora" ou "dia"
+        desde, ate: período (datetime com fuso; ate exclusivo)
+        linha: filtra por linha (opcional)
+        parada: filtra por parada de origem ou destino (opcional)
+        limite: máximo de baldes devolvidos
+    
+    Returns:
+        list: baldes em ordem de início
+    """
+    filtro = {"granularidade": granularidade, "inicio": {"$gte": desde, "$lt": ate}}
+    if linha is not None:
+        filtro["linha"] = linha
+    if parada is not None:
+        filtro["$or"] = [{"parada_origem": parada}, {"parada_destino": parada}]
+    
+    baldes = []
+    for doc in colecao.find(filtro, {"_id": 0, "expira_em": 0}).sort("inicio", ASCENDING).limit(limite):
+        baldes.append({
+            "inicio": doc["inicio"].isoformat(),
+            "linha": doc["linha"],
+            "parada_origem": doc["parada_origem"],
+            "parada_destino": doc["parada_destino"],
+            "deteccoes": doc.get("deteccoes", 0),
+            "headway_medio_s": (
+                round(doc["headway_soma_s"] / doc["headway_n"], 1) if doc.get("headway_n") else None
+            ),
+            "tempo_viagem_medio_min": (
+                round(doc["viagem_soma_min"] / doc["viagem_n"], 1) if doc.get("viagem_n") else None
+            )
+        })
+    return baldes
@@ -0,0 +1,141 @@
+"""
+Agendador de Inferência - Micro-lotes com fila limitada
+Sistema BRT Recife
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class FilaCheiaError(Exception):
+    """Fila de inferência cheia - o chamador deve aplicar backpressure (HTTP 429)"""
+
+
+class InferenceScheduler:
+    """
+    Junta os frames que chegam em micro-lotes e processa cada lote
+    em uma única chamada, numa thread de fundo
+    
+    Cada chamador recebe um Future que é resolvido quando o lote dele
+    termina. Com a fila cheia, submit() falha imediatamente em vez de
+    deixar a latência crescer sem limite.
+    
+    Attributes:
+        processar_lote (callable): função (imgs, cameras) -> lista_de_resultados
+        max_lote (int): tamanho máximo do micro-lote
+        max_espera (float): tempo máximo (s) esperando o lote encher
+    
+    Example:
+        >>> scheduler = InferenceScheduler(detectar_linhas_onibus, max_lote=8)
+        >>> future = scheduler.submit(img, "camera_A")
+        >>> linha = future.result(timeout=30)
+    """
+    
+    def __init__(self, processar_lote, max_lote=8, max_espera_ms=50, max_fila=32):
+        """
+        Args:
+            processar_lote: função que recebe as listas (imgs, cameras) e
+                devolve uma lista de resultados na mesma ordem
+            max_lote: máximo de itens por chamada de processar_lote
+            max_espera_ms: quanto esperar (ms) por mais itens antes de processar
+            max_fila: máximo de itens aguardando (acima disso submit falha)
+        """
+        self.processar_lote = processar_lote
+        self.max_lote = max_lote
+        self.max_espera = max_espera_ms / 1000
+        self._fila = queue.Queue(maxsize=max_fila)
+        self._lock_submit = threading.Lock()  # submit_lote entra inteiro na fila
+        
+        self._thread = threading.Thread(
+            target=self._loop, name="inference-scheduler", daemon=True
+        )
+        self._thread.start()
+        print(f"✅ InferenceScheduler iniciado (lote={max_lote}, espera={max_espera_ms}ms, fila={max_fila})")
+    
+    def submit(self, img, camera_id=None):
+        """
+        Enfileira um frame para o próximo micro-lote
+        
+        Args:
+            img: imagem numpy array (BGR)
+            camera_id: câmera de origem (frames da mesma câmera mantêm a ordem)
+        
+        Returns:
+            Future: resolvido com o resultado do item
+        
+        Raises:
+            FilaCheiaError: se a fila estiver cheia
+        """
+        future = Future()
+        try:
+            with self._lock_submit:
+                self._fila.put_nowait((img, camera_id, future))
+        except queue.Full:
+            raise FilaCheiaError(f"Fila de inferência cheia ({self._fila.maxsize} itens)")
+        return future
+    
+    def submit_lote(self, imgs, camera_id=None):
+        """
+        Enfileira vários frames de uma vez: todos ou nenhum
+        
+        Os frames entram juntos (sem frames de outros chamadores no meio),
+        então uma rajada de até max_lote frames vai para o mesmo micro-lote
+        se a fila estava vazia.
+        
+        Returns:
+            list: um Future por frame, na mesma ordem
+        
+        Raises:
+            FilaCheiaError: se não há espaço para todos (nenhum é enfileirado)
+        """
+        futures = [Future() for _ in imgs]
+        
+        # Só quem segura o lock põe na fila; a thread do lote só tira, então
+        # o espaço livre conferido aqui não diminui antes dos put_nowait
+        with self._lock_submit:
+            livres = self._fila.maxsize - self._fila.qsize()
+            if len(imgs) > livres:
+                raise FilaCheiaError(
+                    f"Fila de inferência sem espaço para {len(imgs)} frames ({livres} livres)"
+                )
+            for img, future in zip(imgs, futures):
+                self._fila.put_nowait((img, camera_id, future))
+        
+        return futures
+    
+    def tamanho_fila(self):
+        """Quantidade de itens aguardando processamento"""
+        return self._fila.qsize()
+    
+    def _coletar_lote(self):
+        """Bloqueia até o primeiro item e junta outros até max_lote ou max_espera"""
+        lote = [self._fila.get()]
+        limite = time.monotonic() + self.max_espera
+        
+        while len(lote) < self.max_lote:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        
+        return lote
+    
+    def _loop(self):
+        while True:
+            lote = self._coletar_lote()
+            imgs = [img for img, _, _ in lote]
+            cameras = [camera_id for _, camera_id, _ in lote]
+            
+            try:
+                resultados = self.processar_lote(imgs, cameras)
+                for (_, _, future), resultado in zip(lote, resultados):
+                    future.set_result(resultado)
+            except Exception as e:
+                print(f"❌ Erro no micro-lote ({len(lote)} itens): {e}")
+                for _, _, future in lote:
+                    if not future.done():
+                        future.set_exception(e)
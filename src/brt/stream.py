@@ -0,0 +1,300 @@
+"""
+Ingestão de Stream - Frames direto de uma câmera MJPEG/RTSP
+Sistema BRT Recife
+
+Em vez de um POST multipart por frame, o servidor abre a câmera (URL
+MJPEG/HTTP ou RTSP, via cv2.VideoCapture) e puxa os frames numa thread.
+Os frames são amostrados a uma taxa configurável e vão direto para a fila
+de inferência. Só um frame por câmera fica em andamento: enquanto o
+detector não termina, os frames seguintes são descartados, então a
+detecção sempre trabalha com a cena mais recente.
+"""
+import itertools
+import threading
+import time
+from urllib.parse import urlsplit
+
+import cv2
+
+from .scheduler import FilaCheiaError
+
+ESQUEMAS_STREAM = ("rtsp", "rtsps", "http", "https")
+
+
+def validar_url_stream(url, hosts_permitidos=None):
+    """
+    Confere se a URL é de uma câmera de rede que o servidor pode abrir
+    
+    O cv2.VideoCapture abre qualquer coisa (arquivo local, índice de câmera,
+    pipeline do FFmpeg), então só passam URLs rtsp/http(s) com host. O host
+    precisa estar na lista: sem lista nenhum stream é aceito, senão o servidor
+    abriria conexões para a rede interna (loopback, 169.254.169.254, ...).
+    
+    Args:
+        url: URL informada no POST /streams
+        hosts_permitidos: hosts aceitos (vazio/None = nenhum)
+    
+    Raises:
+        ValueError: se a URL não for aceita (mensagem para a resposta 400)
+    """
+    try:
+        partes = urlsplit(url)
+        host = partes.hostname
+    except ValueError:
+        raise ValueError("URL do stream inválida")
+    
+    if partes.scheme.lower() not in ESQUEMAS_STREAM:
+        raise ValueError(f"Esquema não suportado (use {', '.join(ESQUEMAS_STREAM)})")
+    
+    if not host:
+        raise ValueError("URL do stream sem host")
+    
+    if not hosts_permitidos:
+        raise ValueError("Nenhum host de câmera permitido para streams")
+    
+    if host.lower() not in hosts_permitidos:
+        raise ValueError(f"Host {host} não permitido para streams")
+
+
+def mascarar_url(url):
+    """URL sem usuário/senha (para listagem e logs)"""
+    partes = urlsplit(url)
+    if partes.username is None and partes.password is None:
+        return url
+    
+    netloc = "***@" + partes.netloc.rpartition("@")[2]
+    return partes._replace(netloc=netloc).geturl()
+
+
+class IngestorStream:
+    """
+    Thread que lê uma câmera e envia frames amostrados para a detecção
+    
+    Attributes:
+        id (str): identificador do stream
+        url (str): URL MJPEG/HTTP ou RTSP (validada com validar_url_stream)
+        camera_id (str): câmera usada no rastreamento/ROI/filtro de movimento
+        fps (float): frames por segundo enviados para a detecção
+        janela_repeticao_s (float): mesma linha dentro da janela não é
+            reportada de novo (o ônibus parado aparece em vários frames)
+        enviados (int): frames que foram para a fila de inferência
+        descartados (int): frames descartados (detector ocupado ou fila cheia)
+        ignorados (int): frames recusados por aceitar_frame (cena parada etc.)
+    
+    Example:
+        >>> ingestor = IngestorStream("s1", "rtsp://10.0.0.5/stream", "camera_A",
+        ...                           fila_inferencia, registrar, fps=1)
+        >>> ingestor.iniciar()
+    """
+    
+    def __init__(self, id, url, camera_id, fila, ao_detectar, fps=1.0,
+                 aceitar_frame=None, frame_enviado=None, janela_repeticao_s=60, dados=None):
+        """
+        Args:
+            id: identificador do stream
+            url: URL da câmera
+            camera_id: identificador da câmera
+            fila: objeto com submit(img, camera_id) -> Future (agendador ou pool)
+            ao_detectar: callback(ingestor, linha) para cada linha nova
+            fps: taxa de amostragem enviada para a detecção
+            aceitar_frame: callback(camera_id, img) -> bool (opcional)
+            frame_enviado: callback(camera_id, img) depois que o frame entrou
+                na fila (opcional; ex: confirmar o filtro de movimento)
+            janela_repeticao_s: intervalo mínimo para reportar a mesma linha
+            dados: informações extras do stream (ex: paradas)
+        """
+        self.id = id
+        self.url = url
+        self.camera_id = camera_id
+        self.fila = fila
+        self.ao_detectar = ao_detectar
+        self.fps = fps
+        self.aceitar_frame = aceitar_frame
+        self.frame_enviado = frame_enviado
+        self.janela_repeticao_s = janela_repeticao_s
+        self.dados = dados or {}
+        
+        self.enviados = 0
+        self.descartados = 0
+        self.ignorados = 0
+        self.deteccoes = 0
+        self.ultima_linha = None
+        self.conectado = False
+        self.erro = None
+        
+        self._em_andamento = None
+        self._reportadas = {}  # linha -> time.monotonic() do último reporte
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"stream-{id}", daemon=True)
+    
+    def iniciar(self):
+        self._thread.start()
+    
+    def parar(self, timeout=5):
+        """Sinaliza a thread para terminar e espera ela soltar a câmera"""
+        self._parar.set()
+        self._thread.join(timeout)
+    
+    def _abrir(self):
+        """Abre a câmera"""
+        captura = cv2.VideoCapture(self.url)
+        if captura.isOpened():
+            # Buffer mínimo: o frame lido é o mais recente possível
+            captura.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return captura
+    
+    def _loop(self):
+        intervalo = 1.0 / self.fps if self.fps > 0 else 0
+        proximo = 0.0
+        tentativas = 0
+        captura = None
+        
+        while not self._parar.is_set():
+            if captura is None or not captura.isOpened():
+                captura = self._abrir()
+                if not captura.isOpened():
+                    self.conectado = False
+                    self.erro = "Não foi possível abrir o stream"
+                    tentativas += 1
+                    self._parar.wait(min(2 ** tentativas, 30))
+                    continue
+                print(f"📹 Stream {self.id} conectado ({mascarar_url(self.url)})")
+                self.conectado = True
+                self.erro = None
+            
+            # grab() sem decodificar: frames fora da amostragem saem baratos
+            if not captura.grab():
+                print(f"⚠️  Stream {self.id} sem frames, reconectando...")
+                captura.release()
+                captura = None
+                self.conectado = False
+                tentativas += 1
+                self._parar.wait(min(2 ** tentativas, 30))
+                continue
+            
+            tentativas = 0
+            agora = time.monotonic()
+            if agora < proximo:
+                continue
+            proximo = agora + intervalo
+            
+            # Detector ainda no frame anterior: este já nasce velho
+            if self._em_andamento is not None and not self._em_andamento.done():
+                self.descartados += 1
+                continue
+            
+            ok, frame = captura.retrieve()
+            if not ok or frame is None:
+                continue
+            
+            if self.aceitar_frame is not None and not self.aceitar_frame(self.camera_id, frame):
+                self.ignorados += 1
+                continue
+            
+            try:
+                self._em_andamento = self.fila.submit(frame, self.camera_id)
+            except FilaCheiaError:
+                self.descartados += 1
+                continue
+            
+            self.enviados += 1
+            self._em_andamento.add_done_callback(self._concluir)
+            if self.frame_enviado is not None:
+                self.frame_enviado(self.camera_id, frame)
+        
+        if captura is not None:
+            captura.release()
+        self.conectado = False
+        print(f"⏹️  Stream {self.id} encerrado")
+    
+    def _concluir(self, future):
+        """Callback do Future: reporta a linha se ela não apareceu há pouco"""
+        try:
+            linha = future.result()
+        except Exception as e:
+            print(f"❌ Erro na detecção do stream {self.id}: {e}")
+            return
+        
+        if not linha:
+            return
+        
+        agora = time.monotonic()
+        ultimo = self._reportadas.get(linha)
+        self._reportadas[linha] = agora
+        if ultimo is not None and agora - ultimo < self.janela_repeticao_s:
+            return
+        
+        self.ultima_linha = linha
+        self.deteccoes += 1
+        try:
+            self.ao_detectar(self, linha)
+        except Exception as e:
+            print(f"❌ Erro ao registrar detecção do stream {self.id}: {e}")
+    
+    def to_dict(self):
+        """Estado do stream para o GET /streams"""
+        return {
+            "stream_id": self.id,
+            "url": mascarar_url(self.url),
+            "camera_id": self.camera_id,
+            "fps": self.fps,
+            "conectado": self.conectado,
+            "erro": self.erro,
+            "enviados": self.enviados,
+            "descartados": self.descartados,
+            "ignorados": self.ignorados,
+            "deteccoes": self.deteccoes,
+            "ultima_linha": self.ultima_linha,
+            **self.dados
+        }
+
+
+class GerenciadorStreams:
+    """
+    Streams ativos do servidor, com limite de quantidade
+    
+    Attributes:
+        max_streams (int): máximo de câmeras abertas ao mesmo tempo
+    """
+    
+    def __init__(self, max_streams=4):
+        self.max_streams = max_streams
+        self._streams = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def adicionar(self, **kwargs):
+        """
+        Cria e inicia um IngestorStream (kwargs do construtor, sem id)
+        
+        Returns:
+            IngestorStream ou None se o limite de streams foi atingido
+        """
+        with self._lock:
+            if len(self._streams) >= self.max_streams:
+                return None
+            ingestor = IngestorStream(f"s{next(self._ids)}", **kwargs)
+            self._streams[ingestor.id] = ingestor
+        
+        ingestor.iniciar()
+        return ingestor
+    
+    def remover(self, id):
+        """Para e remove o stream (False se não existe)"""
+        with self._lock:
+            ingestor = self._streams.pop(id, None)
+        
+        if ingestor is None:
+            return False
+        
+        ingestor.parar()
+        return True
+    
+    def listar(self):
+        with self._lock:
+            return [ingestor.to_dict() for ingestor in self._streams.values()]
+    
+    def encerrar(self):
+        """Para todos os streams"""
+        for id in list(self._streams):
+            self.remover(id)
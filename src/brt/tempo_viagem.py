@@ -0,0 +1,139 @@
+"""
+Tempo de Viagem - Estimativa aprendida por linha e trecho
+Sistema BRT Recife
+
+Em vez do tempo_medio_min fixo da tabela de linhas, cada trecho
+(linha × origem → destino) tem uma média móvel exponencial (EWMA) do tempo
+observado entre a detecção e a chegada, por faixa horária (o mesmo trecho
+demora mais no pico) e uma geral do trecho. Cada chegada atualiza duas
+médias em O(1); a estimativa é uma consulta em dicionário. Nada de
+reprocessar histórico: o estado é só (média, amostras) por chave, salvo no
+MongoDB para sobreviver a reinícios.
+"""
+import threading
+
+
+class EstimadorTempoViagem:
+    """
+    EWMA do tempo de viagem por trecho e faixa horária
+    
+    A estimativa usa, nesta ordem: a faixa horária do trecho (se já tem
+    min_amostras), a média geral do trecho (idem) e o valor padrão da
+    tabela de linhas.
+    
+    Attributes:
+        alfa (float): peso da observação nova na média (0-1)
+        min_amostras (int): amostras antes de confiar numa média
+        min_min (float): observações abaixo disso são descartadas (chegada
+            marcada logo após a detecção, clique duplo...)
+        max_min (float): observações acima disso são descartadas (ônibus
+            que nunca chegou, chegada marcada errada...)
+    
+    Example:
+        >>> estimador = EstimadorTempoViagem()
+        >>> estimador.observar("437", "A", "B", hora_deteccao, 6.5)
+        >>> estimador.estimar("437", "A", "B", agora, padrao=5)
+        (5.0, 'tabela')
+    """
+    
+    def __init__(self, alfa=0.2, min_amostras=3, min_min=1.0, max_min=180):
+        self.alfa = alfa
+        self.min_amostras = min_amostras
+        self.min_min = min_min
+        self.max_min = max_min
+        self.observacoes = 0
+        self.descartadas = 0
+        
+        self._medias = {}       # (linha, origem, destino, faixa) -> [média, amostras]
+        self._alteradas = set()  # chaves ainda não salvas no banco
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _faixa(quando):
+        """Faixa horária (hora UTC da detecção)"""
+        return quando.hour
+    
+    def estimar(self, linha, origem, destino, quando, padrao):
+        """
+        Tempo de viagem esperado para um ônibus detectado agora
+        
+        Returns:
+            tuple: (minutos, fonte) com fonte "faixa_horaria", "trecho" ou "tabela"
+        """
+        with self._lock:
+            for faixa, fonte in ((self._faixa(quando), "faixa_horaria"), (None, "trecho")):
+                media = self._medias.get((linha, origem, destino, faixa))
+                if media is not None and media[1] >= self.min_amostras:
+                    return round(media[0], 1), fonte
+        
+        return float(padrao), "tabela"
+    
+    def observar(self, linha, origem, destino, quando, minutos):
+        """
+        Uma viagem observada (detecção em quando, chegada minutos depois)
+        
+        Returns:
+            bool: False se a observação foi descartada
+        """
+        if minutos <= 0 or not self.min_min <= minutos <= self.max_min:
+            with self._lock:
+                self.descartadas += 1
+            return False
+        
+        with self._lock:
+            for faixa in (self._faixa(quando), None):
+                chave = (linha, origem, destino, faixa)
+                media = self._medias.get(chave)
+                if media is None:
+                    self._medias[chave] = [minutos, 1]
+                else:
+                    # Média simples até min_amostras (início menos ruidoso), depois EWMA
+                    peso = max(self.alfa, 1 / (media[1] + 1))
+                    media[0] += peso * (minutos - media[0])
+                    media[1] += 1
+                self._alteradas.add(chave)
+            self.observacoes += 1
+        
+        return True
+    
+    def exportar_alteradas(self):
+        """
+        Médias alteradas desde a última exportação (para salvar no banco)
+        
+        Returns:
+            list: documentos {linha, origem, destino, faixa, media_min, amostras}
+        """
+        with self._lock:
+            alteradas, self._alteradas = self._alteradas, set()
+            return [
+                {
+                    "linha": linha,
+                    "origem": origem,
+                    "destino": destino,
+                    "faixa": faixa,
+                    "media_min": self._medias[(linha, origem, destino, faixa)][0],
+                    "amostras": self._medias[(linha, origem, destino, faixa)][1]
+                }
+                for linha, origem, destino, faixa in alteradas
+            ]
+    
+    def marcar_alteradas(self, docs):
+        """Devolve documentos que não foram salvos para a próxima exportação"""
+        with self._lock:
+            self._alteradas.update((d["linha"], d["origem"], d["destino"], d["faixa"]) for d in docs)
+    
+    def carregar(self, docs):
+        """Restaura médias salvas (documentos de exportar_alteradas)"""
+        with self._lock:
+            for d in docs:
+                chave = (d["linha"], d["origem"], d["destino"], d["faixa"])
+                self._medias.setdefault(chave, [d["media_min"], d["amostras"]])
+    
+    def stats(self):
+        """Contadores para o /stats"""
+        with self._lock:
+            return {
+                "trechos": sum(1 for chave in self._medias if chave[3] is None),
+                "observacoes": self.observacoes,
+                "descartadas": self.descartadas
+            }
@@ -0,0 +1,199 @@
+"""
+Rastreador de Ônibus - Trilhas por câmera entre frames (IoU)
+Sistema BRT Recife
+
+Cada caixa "bus" do YOLO é associada à trilha da mesma câmera com maior
+sobreposição (IoU) no frame anterior. As leituras do OCR de frames
+consecutivos viram votos ponderados pela confiança; quando uma linha passa
+do limiar ela é confirmada, fica presa à trilha e o mesmo ônibus não é
+lido (nem reportado) de novo a cada frame.
+"""
+import itertools
+import threading
+import time
+
+
+def iou(a, b):
+    """
+    Interseção sobre união de duas caixas (x1, y1, x2, y2)
+    
+    Returns:
+        float: 0.0 (sem sobreposição) a 1.0 (caixas iguais)
+    """
+    x1 = max(a[0], b[0])
+    y1 = max(a[1], b[1])
+    x2 = min(a[2], b[2])
+    y2 = min(a[3], b[3])
+    
+    intersecao = max(0, x2 - x1) * max(0, y2 - y1)
+    if intersecao == 0:
+        return 0.0
+    
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return intersecao / float(area_a + area_b - intersecao)
+
+
+class Trilha:
+    """
+    Um ônibus acompanhado ao longo dos frames de uma câmera
+    
+    Attributes:
+        id (int): identificador da trilha
+        caixa (tuple): última caixa (x1, y1, x2, y2)
+        linha (str): linha confirmada pelos votos (None até confirmar)
+        votos (dict): linha -> soma das confianças das leituras do OCR
+        tentativas_ocr (int): quantas vezes o OCR já rodou nesta trilha
+        reportada (bool): se a linha já foi devolvida como detecção nova
+        visto_em (float): time.monotonic() do último frame com a trilha
+    """
+    
+    def __init__(self, id, caixa, agora):
+        self.id = id
+        self.caixa = caixa
+        self.linha = None
+        self.votos = {}
+        self.tentativas_ocr = 0
+        self.reportada = False
+        self.visto_em = agora
+    
+    def precisa_ocr(self, max_tentativas):
+        """True enquanto a linha não foi confirmada e ainda há tentativas"""
+        return self.linha is None and self.tentativas_ocr < max_tentativas
+    
+    def votar(self, leituras, limiar, repetidas=False):
+        """
+        Soma as leituras de um frame aos votos da trilha
+        
+        Args:
+            leituras: [(linha, conf), ...] de um letreiro
+            limiar: soma de confiança necessária para confirmar a linha
+            repetidas: leituras reaproveitadas do cache de OCR. Só votam se
+                a trilha ainda não tem votos (ônibus novo com o letreiro de
+                um que já passou); senão contam a tentativa sem somar, ou
+                uma leitura errada de um ônibus parado seria confirmada só
+                por se repetir a cada frame
+        
+        Returns:
+            str ou None: linha confirmada (None enquanto nenhuma passar do limiar)
+        """
+        self.tentativas_ocr += 1
+        if repetidas and self.votos:
+            return self.linha
+        
+        for linha, conf in leituras:
+            self.votos[linha] = self.votos.get(linha, 0.0) + conf
+        
+        if self.linha is None and self.votos:
+            melhor = max(self.votos, key=self.votos.get)
+            if self.votos[melhor] >= limiar:
+                self.linha = melhor
+        
+        return self.linha
+
+
+class RastreadorOnibus:
+    """
+    Rastreador IoU guloso, com trilhas separadas por câmera/parada
+    
+    Attributes:
+        iou_min (float): sobreposição mínima para continuar uma trilha
+        max_ausencia_s (float): tempo sem aparecer até a trilha ser descartada
+        max_tentativas_ocr (int): OCRs por trilha antes de desistir do letreiro
+        limiar_votos (float): soma de confiança para confirmar uma linha
+    
+    Example:
+        >>> rastreador = RastreadorOnibus()
+        >>> trilhas = rastreador.atualizar("camera_A", [(10, 20, 300, 250)])
+        >>> if trilhas[0].precisa_ocr(rastreador.max_tentativas_ocr):
+        ...     trilhas[0].votar(rodar_ocr(...), rastreador.limiar_votos)
+    """
+    
+    def __init__(self, iou_min=0.3, max_ausencia_s=10, max_tentativas_ocr=5, limiar_votos=0.8):
+        self.iou_min = iou_min
+        self.max_ausencia_s = max_ausencia_s
+        self.max_tentativas_ocr = max_tentativas_ocr
+        self.limiar_votos = limiar_votos
+        self._trilhas = {}  # camera_id -> [Trilha, ...]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+    
+    def atualizar(self, camera_id, caixas):
+        """
+        Associa as caixas do frame às trilhas da câmera
+        
+        Deve ser chamado a cada frame da câmera, mesmo sem caixas, para
+        que trilhas de ônibus que já saíram expirem.
+        
+        Args:
+            camera_id: identificador da câmera/parada
+            caixas: lista de caixas (x1, y1, x2, y2) de ônibus no frame
+        
+        Returns:
+            list: Trilha de cada caixa, na mesma ordem
+        """
+        agora = time.monotonic()
+        
+        with self._lock:
+            trilhas = [
+                t for t in self._trilhas.get(camera_id, [])
+                if agora - t.visto_em <= self.max_ausencia_s
+            ]
+            
+            # Pares (caixa, trilha) do maior IoU para o menor
+            pares = sorted(
+                (
+                    (iou(caixa, trilha.caixa), i, j)
+                    for i, caixa in enumerate(caixas)
+                    for j, trilha in enumerate(trilhas)
+                ),
+                reverse=True
+            )
+            
+            resultado = [None] * len(caixas)
+            usadas = set()
+            for valor, i, j in pares:
+                if valor < self.iou_min:
+                    break
+                if resultado[i] is not None or j in usadas:
+                    continue
+                resultado[i] = trilhas[j]
+                usadas.add(j)
+            
+            # Caixas sem trilha abrem trilhas novas
+            for i, caixa in enumerate(caixas):
+                if resultado[i] is None:
+                    resultado[i] = Trilha(next(self._ids), caixa, agora)
+                    trilhas.append(resultado[i])
+                
+                resultado[i].caixa = caixa
+                resultado[i].visto_em = agora
+            
+            self._trilhas[camera_id] = trilhas
+            return resultado
+    
+    def reportar(self, camera_id, linha):
+        """
+        Marca como reportada a trilha da câmera com essa linha
+        
+        Returns:
+            bool: False se o mesmo ônibus já tinha sido reportado
+                (detecção duplicada), True caso contrário
+        """
+        with self._lock:
+            trilhas = [t for t in self._trilhas.get(camera_id, []) if t.linha == linha]
+            
+            if not trilhas:
+                return True
+            
+            for trilha in trilhas:
+                if not trilha.reportada:
+                    trilha.reportada = True
+                    return True
+            
+            return False
+    
+    def total_trilhas(self):
+        """Quantidade de trilhas em memória (todas as câmeras)"""
+        with self._lock:
+            return sum(len(t) for t in self._trilhas.values())
@@ -0,0 +1,84 @@
+"""
+Teste de paridade dos backends do YOLO (PyTorch x ONNX x OpenVINO)
+Roda as imagens de exemplo do ultralytics em cada backend e compara com
+o PyTorch. Backend sem o runtime instalado é pulado (carregar_yolo cairia
+no PyTorch e o teste compararia o PyTorch com ele mesmo)
+"""
+import importlib.util
+
+import cv2
+import pytest
+
+from src.brt.backends import carregar_yolo
+from src.brt.tracker import iou
+
+IMAGENS_TESTE = ["bus.jpg", "zidane.jpg"]  # ultralytics/assets
+RUNTIMES = {"onnx": ("onnx", "onnxruntime"), "openvino": ("openvino",)}
+IOU_MIN = 0.9
+DIFERENCA_CONF_MAX = 0.05
+
+
+def deteccoes(modelo, img):
+    """Lista (classe, conf, caixa) das detecções com conf >= 0.5"""
+    results = modelo(img, conf=0.5, verbose=False)[0]
+    return [
+        (modelo.names[int(det.cls[0])], float(det.conf[0]), tuple(map(float, det.xyxy[0])))
+        for det in results.boxes
+    ]
+
+
+def comparar(referencia, candidata):
+    """Cada detecção da referência precisa de um par equivalente na candidata"""
+    if len(referencia) != len(candidata):
+        return False
+    
+    for classe, conf, caixa in referencia:
+        par = [
+            c for c in candidata
+            if c[0] == classe
+            and iou(caixa, c[2]) >= IOU_MIN
+            and abs(conf - c[1]) <= DIFERENCA_CONF_MAX
+        ]
+        if not par:
+            return False
+    
+    return True
+
+
+def imagens_teste():
+    """Imagens de exemplo que vêm com o ultralytics"""
+    pytest.importorskip("ultralytics")
+    from ultralytics.utils import ASSETS
+    
+    imagens = []
+    for nome in IMAGENS_TESTE:
+        img = cv2.imread(str(ASSETS / nome))
+        assert img is not None, f"{ASSETS / nome} não é uma imagem válida"
+        imagens.append((nome, img))
+    return imagens
+
+
+@pytest.mark.parametrize("backend", list(RUNTIMES))
+def test_paridade_backends(backend):
+    faltando = [m for m in RUNTIMES[backend] if importlib.util.find_spec(m) is None]
+    if faltando:
+        pytest.skip(f"{backend} sem runtime instalado ({', '.join(faltando)})")
+    
+    imagens = imagens_teste()
+    referencia = carregar_yolo("pytorch")
+    modelo = carregar_yolo(backend)
+    
+    for nome, img in imagens:
+        esperado = deteccoes(referencia, img)
+        obtido = deteccoes(modelo, img)
+        
+        print(f"🔍 {backend} | {nome}: {len(obtido)} detecções (PyTorch: {len(esperado)})")
+        assert esperado, f"PyTorch não detectou nada em {nome}"
+        assert comparar(esperado, obtido), f"{backend} divergiu do PyTorch em {nome}"
+    
+    print(f"✅ {backend} equivalente ao PyTorch")
+
+
+if __name__ == "__main__":
+    for backend in RUNTIMES:
+        test_paridade_backends(backend)
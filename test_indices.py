@@ -0,0 +1,93 @@
+"""
+Teste dos planos de consulta das detecções
+Cria os índices numa collection temporária e confere via explain que as
+consultas de /previsoes e da chegada usam índice (IXSCAN), não COLLSCAN
+
+Precisa de um MongoDB: TEST_MONGO_URI (padrão: mongodb://localhost:27017);
+sem ele o teste é pulado (skip), não aprovado
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from src.brt.indices import garantir_indices_deteccoes, consulta_previsoes
+
+TEST_MONGO_URI = os.getenv("TEST_MONGO_URI", "mongodb://localhost:27017")
+PARADAS = ["A", "B", "C", "D"]
+
+
+def estagios(plano):
+    """Todos os estágios (stage) de um plano do explain, recursivamente"""
+    encontrados = []
+    if isinstance(plano, dict):
+        if "stage" in plano:
+            encontrados.append(plano["stage"])
+        for valor in plano.values():
+            encontrados.extend(estagios(valor))
+    elif isinstance(plano, list):
+        for item in plano:
+            encontrados.extend(estagios(item))
+    return encontrados
+
+
+def plano_vencedor(explain):
+    return explain["queryPlanner"]["winningPlan"]
+
+
+def popular(colecao, agora):
+    """Detecções em rota/chegou/expirado espalhadas pelas paradas"""
+    docs = []
+    for i in range(400):
+        hora = agora - timedelta(minutes=i % 30)
+        docs.append({
+            "deteccao_id": f"DET_TESTE_{i}",
+            "linha": "2441",
+            "parada_destino": PARADAS[i % len(PARADAS)],
+            "hora_deteccao": hora,
+            "previsao_chegada": hora + timedelta(minutes=5),
+            "status": ("em_rota", "chegou", "expirado")[i % 3]
+        })
+    colecao.insert_many(docs)
+
+
+def test_planos_usam_indice():
+    client = MongoClient(TEST_MONGO_URI, tz_aware=True, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        client.close()
+        pytest.skip(f"MongoDB indisponível em {TEST_MONGO_URI}: {e}")
+    
+    db = client["brt_teste_indices"]
+    colecao = db[f"deteccoes_{uuid.uuid4().hex[:8]}"]
+    
+    try:
+        agora = datetime.now(timezone.utc)
+        garantir_indices_deteccoes(colecao, ttl_s=1800)
+        popular(colecao, agora)
+        
+        # /previsoes/<parada>
+        plano = plano_vencedor(consulta_previsoes(colecao, "B", desde=agora - timedelta(minutes=2)).explain())
+        print(f"🔍 previsoes: {estagios(plano)}")
+        assert "IXSCAN" in estagios(plano), "consulta de /previsoes sem índice"
+        assert "COLLSCAN" not in estagios(plano), "consulta de /previsoes varre a collection"
+        assert "SORT" not in estagios(plano), "ordenação por previsao_chegada em memória"
+        
+        # POST /deteccao/<id>/chegada
+        plano = plano_vencedor(colecao.find({"deteccao_id": "DET_TESTE_7"}).explain())
+        print(f"🔍 chegada: {estagios(plano)}")
+        assert "IXSCAN" in estagios(plano), "busca da chegada sem índice"
+        assert "COLLSCAN" not in estagios(plano), "busca da chegada varre a collection"
+    finally:
+        colecao.drop()
+        client.close()
+    
+    print("✅ Consultas das detecções usam índice")
+
+
+if __name__ == "__main__":
+    test_planos_usam_indice()
@@ -0,0 +1,90 @@
+"""
+Teste do cache de OCR
+Letreiros sintéticos das linhas conhecidas: frames ruidosos do mesmo
+letreiro reaproveitam a leitura, mas uma linha nunca acerta no cache a
+entrada de outra (nem a mesma linha de outra câmera)
+"""
+import itertools
+
+import cv2
+import numpy as np
+
+from src.brt.ocr_cache import CacheOCR, distancia, hash_letreiro
+
+LINHAS = ["437", "2441", "2450", "2444"]
+FONTES = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_COMPLEX]
+
+
+def letreiro(linha, fonte, semente, ruido=4):
+    """Número em LED laranja + destino, com ruído do sensor"""
+    rng = np.random.default_rng(semente)
+    img = np.zeros((90, 320, 3), dtype=np.uint8)
+    cv2.putText(img, linha, (10, 65), fonte, 1.8, (0, 170, 255), 3)
+    cv2.putText(img, "CONDE DA BOA VISTA", (150, 80), cv2.FONT_HERSHEY_PLAIN, 0.8, (0, 170, 255), 1)
+    img = np.clip(img + rng.normal(0, ruido, img.shape), 0, 255).astype(np.uint8)
+    return cv2.GaussianBlur(img, (3, 3), 0)
+
+
+def trocar_bits(chave, n):
+    """Hash com os n bits confiáveis menos significativos invertidos"""
+    bits, mascara = chave
+    trocados = 0
+    for _ in range(n):
+        bit = mascara & -mascara  # bit confiável mais baixo
+        trocados |= bit
+        mascara ^= bit
+    return bits ^ trocados, chave[1]
+
+
+def test_linhas_diferentes_nao_colidem():
+    cache = CacheOCR()
+    
+    for fonte in FONTES:
+        hashes = {linha: hash_letreiro(letreiro(linha, fonte, 1)) for linha in LINHAS}
+        
+        for a, b in itertools.combinations(LINHAS, 2):
+            d = distancia(hashes[a], hashes[b])
+            print(f"🔍 {a} x {b}: {d} bits")
+            assert d > 4 * cache.distancia_max, f"{a} e {b} quase iguais no hash ({d} bits)"
+        
+        # Cada linha guardada na mesma câmera; outro frame de cada uma só acha a sua
+        for linha, chave in hashes.items():
+            cache.guardar(chave, linha, "A")
+        
+        for linha in LINHAS:
+            encontrado, lida = cache.obter(hash_letreiro(letreiro(linha, fonte, 2)), "A")
+            assert not encontrado or lida == linha, f"{linha} leu {lida} do cache"
+
+
+def test_frames_ruidosos_do_mesmo_letreiro_acertam():
+    for fonte in FONTES:
+        for linha in LINHAS:
+            cache = CacheOCR()
+            cache.guardar(hash_letreiro(letreiro(linha, fonte, 1)), linha, "A")
+            
+            for semente in range(2, 12):
+                for ruido in (4, 12):
+                    chave = hash_letreiro(letreiro(linha, fonte, semente, ruido))
+                    assert cache.obter(chave, "A") == (True, linha), \
+                        f"{linha} (fonte {fonte}, ruído {ruido}) não achou o próprio letreiro"
+    
+    print("✅ Frames ruidosos do mesmo letreiro reaproveitam a leitura")
+
+
+def test_mesmo_letreiro_reaproveita_so_na_mesma_camera():
+    cache = CacheOCR()
+    chave = hash_letreiro(letreiro("2441", FONTES[0], 1, ruido=0))
+    cache.guardar(chave, "2441", "A")
+    
+    assert cache.obter(chave, "A") == (True, "2441")
+    assert cache.obter(chave, "B") == (False, None)
+    assert cache.obter(trocar_bits(chave, 2), "A") == (True, "2441")
+    assert cache.obter(trocar_bits(chave, 3), "A") == (False, None)
+    
+    print(f"✅ Cache de OCR separado por câmera: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    test_linhas_diferentes_nao_colidem()
+    test_frames_ruidosos_do_mesmo_letreiro_acertam()
+    test_mesmo_letreiro_reaproveita_so_na_mesma_camera()
@@ -0,0 +1,76 @@
+"""
+Teste do quadro de chegadas em memória
+A mesma detecção entregue de novo (eco do change stream, com a previsão
+truncada para milissegundos pelo BSON) não pode contar duas vezes na
+posição da fila
+"""
+from datetime import datetime, timedelta, timezone
+
+from src.brt.quadro import QuadroChegadas
+
+AGORA = datetime(2026, 1, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+
+
+def deteccao(deteccao_id, previsao):
+    return {
+        "deteccao_id": deteccao_id,
+        "linha": "437",
+        "nome_linha": "TI Camaragibe / Derby",
+        "previsao_chegada": previsao
+    }
+
+
+def bson(det):
+    """Documento como volta do MongoDB (datas em milissegundos)"""
+    previsao = det["previsao_chegada"]
+    return {**det, "previsao_chegada": previsao.replace(microsecond=previsao.microsecond // 1000 * 1000)}
+
+
+def test_deteccao_repetida_conta_uma_vez():
+    quadro = QuadroChegadas(lambda parada: [], ttl_s=3600, limite_atraso=timedelta(minutes=5))
+    quadro.obter("B", AGORA)
+    
+    det = deteccao("DET_1", AGORA + timedelta(minutes=7))
+    quadro.adicionar("B", det)
+    versao = quadro.versao("B")
+    
+    # Eco do change stream: mesmo id, previsão truncada
+    quadro.adicionar("B", bson(det))
+    quadro.adicionar("B", bson(det))
+    
+    assert quadro.contar("B", AGORA) == 1
+    assert [d["deteccao_id"] for _, d in quadro.obter("B", AGORA)] == ["DET_1"]
+    
+    # Só a primeira cópia truncada troca a entrada; as idênticas não acordam os displays
+    assert quadro.versao("B") == versao + 1
+    
+    # Outra detecção entra normalmente; a posição é a contagem sem repetidos
+    quadro.adicionar("B", deteccao("DET_2", AGORA + timedelta(minutes=3)))
+    assert quadro.contar("B", AGORA) == 2
+    assert [d["deteccao_id"] for _, d in quadro.obter("B", AGORA)] == ["DET_2", "DET_1"]
+    
+    # Chegada tira a detecção de vez (não sobra a cópia)
+    quadro.remover("B", "DET_1")
+    assert quadro.contar("B", AGORA) == 1
+    
+    print(f"✅ Detecção repetida conta uma vez no quadro: {quadro.stats()}")
+
+
+def test_recarga_com_registro_durante_a_carga():
+    det = bson(deteccao("DET_1", AGORA + timedelta(minutes=7)))
+    
+    def carregar(parada):
+        # Registrada por este processo enquanto o banco era consultado
+        quadro.adicionar("B", deteccao("DET_1", AGORA + timedelta(minutes=7)))
+        return [det]
+    
+    quadro = QuadroChegadas(carregar, ttl_s=3600)
+    assert quadro.contar("B", AGORA) == 1
+    
+    quadro.adicionar("B", deteccao("DET_1", AGORA + timedelta(minutes=7)))
+    assert quadro.contar("B", AGORA) == 1
+
+
+if __name__ == "__main__":
+    test_deteccao_repetida_conta_uma_vez()
+    test_recarga_com_registro_durante_a_carga()
@@ -0,0 +1,68 @@
+"""
+Teste do rastreador de ônibus e da votação das leituras do OCR
+Caixas que se sobrepõem continuam a mesma trilha; a linha só é confirmada
+por leituras novas somando o limiar, nunca por uma leitura repetida do
+cache de OCR a cada frame
+"""
+from src.brt.tracker import RastreadorOnibus
+
+CAIXA = (100, 50, 500, 350)
+
+
+def test_caixa_sobreposta_continua_a_trilha():
+    rastreador = RastreadorOnibus()
+    
+    primeira = rastreador.atualizar("A", [CAIXA])[0]
+    segunda = rastreador.atualizar("A", [(110, 55, 510, 355)])[0]
+    outra_camera = rastreador.atualizar("B", [CAIXA])[0]
+    
+    assert segunda is primeira
+    assert outra_camera is not primeira
+    assert rastreador.total_trilhas() == 2
+
+
+def test_leitura_repetida_do_cache_nao_confirma():
+    rastreador = RastreadorOnibus(max_tentativas_ocr=10, limiar_votos=0.8)
+    trilha = rastreador.atualizar("A", [CAIXA])[0]
+    
+    # Uma leitura fraca e errada; o ônibus fica parado e o cache devolve a mesma
+    assert trilha.votar([("2444", 0.3)], rastreador.limiar_votos) is None
+    for _ in range(8):
+        assert trilha.votar([("2444", 0.3)], rastreador.limiar_votos, repetidas=True) is None
+    
+    assert trilha.votos == {"2444": 0.3}
+    assert trilha.tentativas_ocr == 9
+    assert trilha.precisa_ocr(rastreador.max_tentativas_ocr)
+    
+    print(f"✅ Leitura repetida não vota de novo: {trilha.votos}")
+
+
+def test_leituras_novas_somam_ate_o_limiar():
+    rastreador = RastreadorOnibus(limiar_votos=0.8)
+    trilha = rastreador.atualizar("A", [CAIXA])[0]
+    
+    assert trilha.votar([("2441", 0.5)], rastreador.limiar_votos) is None
+    assert trilha.votar([("2441", 0.5)], rastreador.limiar_votos) == "2441"
+    assert not trilha.precisa_ocr(rastreador.max_tentativas_ocr)
+
+
+def test_trilha_nova_usa_leitura_do_cache_uma_vez():
+    rastreador = RastreadorOnibus(limiar_votos=0.8)
+    trilha = rastreador.atualizar("A", [CAIXA])[0]
+    
+    # Outro ônibus com o mesmo letreiro já foi lido: a leitura vale um voto
+    assert trilha.votar([("437", 0.9)], rastreador.limiar_votos, repetidas=True) == "437"
+    
+    # Segundo ônibus na mesma câmera: um voto do cache, não um por frame
+    trilha = rastreador.atualizar("A", [CAIXA, (700, 50, 1100, 350)])[1]
+    trilha.votar([("2444", 0.3)], rastreador.limiar_votos, repetidas=True)
+    trilha.votar([("2444", 0.3)], rastreador.limiar_votos, repetidas=True)
+    assert trilha.votos == {"2444": 0.3}
+    assert trilha.linha is None
+
+
+if __name__ == "__main__":
+    test_caixa_sobreposta_continua_a_trilha()
+    test_leitura_repetida_do_cache_nao_confirma()
+    test_leituras_novas_somam_ate_o_limiar()
+    test_trilha_nova_usa_leitura_do_cache_uma_vez()